@@ -9,7 +9,7 @@ import time
 import json
 from collections import defaultdict, Counter
 from datetime import datetime
-from threading import Thread
+from threading import Lock, Thread
 from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 
@@ -51,7 +51,16 @@ DEFAULTS: Dict[str, Any] = {
     "bg": "#0f1117", "bg2": "#181c26", "bg3": "#1f2433",
     "accent": "#4f8ef7", "accent2": "#2ecc8f", "danger": "#e05252",
     "warning": "#f0a500", "fg": "#d6dce8", "fg2": "#7a8499", "border": "#2a3045",
-    "scan_rate": 15.0, "send_timeout": 15, "file_delay": 0.8,
+    "scan_rate": 15.0, "send_timeout": 15, "file_delay": 0.8, "scan_idle_backoff": 2,
+    "use_inotify": True, "incremental_scan": True, "seen_cache_mb": 64, "scan_workers": 4,
+    "scan_deadline": 30.0, "sweep_interval": 600.0,
+    "send_workers": 4, "send_queue_size": 100, "adaptive_concurrency": True,
+    "bandwidth_kbps": 0,
+    "retry_attempts": 8, "retry_base_delay": 5.0,
+    "breaker_threshold": 5, "breaker_probe_interval": 60.0,
+    "batch_uploads": False, "batch_window": 0.5, "batch_max_files": 10, "batch_max_mb": 8,
+    "http_pool_size": 10, "http_keep_alive": True, "http_prewarm": True, "link_fanout": False,
+    "async_engine": False, "dedup_uploads": False, "dedup_links": False,
     "formats": ".jpg,.jpeg,.png,.gif,.bmp,.webp",
     "sound_enabled": True, "sound_volume": 0.8,
     "theme_folder": "",
@@ -152,6 +161,7 @@ class StatisticsStore:
     def __init__(self, path: str, config: Dict):
         self._path   = path
         self._config = config
+        self._lock   = Lock()
         self.sends:  List[dict] = []
         self.errors: List[dict] = []
 
@@ -169,29 +179,45 @@ class StatisticsStore:
         try:
             max_s = self._config.get("max_sends",  10000)
             max_e = self._config.get("max_errors",  2000)
-            self.sends  = self.sends [-max(1, max_s):]
-            self.errors = self.errors[-max(1, max_e):]
+            with self._lock:
+                self.sends  = self.sends [-max(1, max_s):]
+                self.errors = self.errors[-max(1, max_e):]
+                data = {"sends": list(self.sends), "errors": list(self.errors)}
             with open(self._path, "w") as f:
-                json.dump({"sends": self.sends, "errors": self.errors}, f)
+                json.dump(data, f)
         except Exception as e:
             print(f"Error saving stats: {e}")
 
     def record_send(self, *, ok: bool, file: str, webhook: str, folder: str,
-                    ext: str, err_type: str = "", detail: str = "") -> None:
+                    ext: str, err_type: str = "", detail: str = "",
+                    deferred: bool = False, deduplicated: bool = False) -> None:
+        """
+        Deferred sends (skipped while a webhook's circuit is open) and
+        deduplicated ones (content already sent; `ok` if posted as a link,
+        skipped otherwise) are not errors.
+        """
         ts    = time.strftime("%H:%M:%S")
         month = time.strftime("%Y-%m")
-        self.sends.append({"time": ts, "month": month, "file": file,
-                           "webhook": webhook, "folder": folder, "ext": ext, "ok": ok})
-        if not ok:
-            self.errors.append({"time": ts, "type": err_type, "file": file,
-                                "webhook": webhook, "detail": detail})
+        with self._lock:
+            record = {"time": ts, "month": month, "file": file,
+                      "webhook": webhook, "folder": folder, "ext": ext, "ok": ok}
+            if deferred:
+                record["deferred"] = True
+            if deduplicated:
+                record["deduplicated"] = True
+            self.sends.append(record)
+            if not ok and not deferred and not deduplicated:
+                self.errors.append({"time": ts, "type": err_type, "file": file,
+                                    "webhook": webhook, "detail": detail})
+            count = len(self.sends)
         every = max(1, self._config.get("autosave_every", 10))
-        if len(self.sends) % every == 0:
+        if count % every == 0:
             Thread(target=self.save, daemon=True).start()
 
     def clear(self) -> None:
-        self.sends  = []
-        self.errors = []
+        with self._lock:
+            self.sends  = []
+            self.errors = []
 
     def months_data(self, n: int) -> List[Tuple[str, int]]:
         now = datetime.now()
@@ -223,16 +249,20 @@ class StatisticsStore:
         return self._count_by("type", source=self.errors, ok_only=False)
 
     def webhook_table(self) -> List[Tuple]:
-        wh: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        wh: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0, 0])
         for s in self.sends:
             rec = wh[s.get("webhook", "Unknown")]
             if s.get("ok"):
                 rec[0] += 1
+            elif s.get("deferred"):
+                rec[2] += 1
+            elif s.get("deduplicated"):
+                rec[3] += 1
             else:
                 rec[1] += 1
         rows = []
-        for name, (ok, fail) in sorted(wh.items(), key=lambda x: -x[1][0]):
+        for name, (ok, fail, deferred, dedup) in sorted(wh.items(), key=lambda x: -x[1][0]):
             tot  = ok + fail
             rate = f"{100 * ok / tot:.1f}%" if tot else "—"
-            rows.append((name, ok, fail, rate))
+            rows.append((name, ok, fail, deferred, dedup, rate))
         return rows
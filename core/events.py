@@ -5,12 +5,60 @@ Abstract base classes (interfaces) for pluggable components.
 """
 
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from models.send_result import SendResult
+
+if TYPE_CHECKING:
+    from services.payload import Payload
 
 
 class ISender(ABC):
     @abstractmethod
     def send(self, file_path: str, url: str, timeout: int,
-             username: str = "", avatar_url: str = "") -> bool: ...
+             username: str = "", avatar_url: str = "") -> SendResult: ...
+
+    def send_batch(self, file_paths: List[str], url: str, timeout: int,
+                   username: str = "", avatar_url: str = "") -> SendResult:
+        """Post several files as one message; by default, one `send()` per file."""
+        result = SendResult(True)
+        for file_path in file_paths:
+            result = self.send(file_path, url, timeout, username=username, avatar_url=avatar_url)
+            if not result:
+                break
+        return result
+
+    def send_payload(self, payload: "Payload", url: str, timeout: int,
+                     username: str = "", avatar_url: str = "",
+                     wait: bool = False) -> SendResult:
+        """
+        Post a prepared, shared payload; by default, `send_batch()` on its files.
+        With `wait` the sender may fill `SendResult.attachments` from the created message.
+        """
+        return self.send_batch(payload.paths, url, timeout,
+                               username=username, avatar_url=avatar_url)
+
+    def send_links(self, url: str, links: List[str], timeout: int,
+                   username: str = "", avatar_url: str = "") -> SendResult:
+        """
+        Post already uploaded files by URL; only needed by senders that return
+        attachments. By default nothing is posted.
+        """
+        return SendResult(False)
+
+    @property
+    def supports_links(self) -> bool:
+        """Whether `send_links()` is implemented; link modes are off otherwise."""
+        return type(self).send_links is not ISender.send_links
+
+    def limit_bandwidth(self, total: float = 0, per_url: Optional[Dict[str, float]] = None) -> None:
+        """Cap upload bytes per second overall and per webhook URL (0 = unlimited)."""
+
+    def warm(self, urls: Iterable[str], timeout: int) -> None:
+        """Optionally open connections to the given webhooks before sending."""
+
+    def close(self) -> None:
+        """Release pooled connections."""
 
 
 class IAudioPlayer(ABC):
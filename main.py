@@ -4,11 +4,15 @@ main.py
 Entry point. Boots the WIS application.
 """
 
+import multiprocessing
 import os
 import tkinter as tk
 
 from core.config import _PYGAME_OK, SettingsStore, StatisticsStore
 from services.audio import NullAudioPlayer, PygameAudioPlayer
+from services.content_index import ContentIndex
+from services.outbox import Outbox
+from services.seen_index import SeenIndex
 from services.sender import HttpSender
 from ui.main_window import WIS
 
@@ -19,12 +23,24 @@ def main():
     store.load()
     stats = StatisticsStore(os.path.join(base, "wis_stats.json"), store.stats_config)
     stats.load()
-    sender = HttpSender()
+    seen   = SeenIndex(os.path.join(base, "wis_seen.db"))
+    outbox = Outbox(os.path.join(base, "wis_outbox.db"))
+    content = ContentIndex(os.path.join(base, "wis_dedup.db"))
+    sender = HttpSender(pool_size=int(store.values.get("http_pool_size", 10)),
+                        keep_alive=bool(store.values.get("http_keep_alive", True)))
     audio  = PygameAudioPlayer() if _PYGAME_OK else NullAudioPlayer()
     root   = tk.Tk()
-    WIS(root, sender=sender, audio=audio, store=store, stats=stats)
-    root.mainloop()
+    app    = WIS(root, sender=sender, audio=audio, store=store, stats=stats, seen=seen,
+                 outbox=outbox, content=content)
+    try:
+        root.mainloop()
+    finally:
+        app.shutdown()
+        for resource in (sender, content, outbox, seen):
+            resource.close()
 
 
 if __name__ == "__main__":
+    # Content hashing uses a "spawn" process pool; frozen builds need this to start it.
+    multiprocessing.freeze_support()
     main()
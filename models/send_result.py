@@ -0,0 +1,39 @@
+"""
+models/send_result.py
+---------------------
+SendResult: outcome of a single webhook upload.
+"""
+
+from typing import Mapping, Optional, Sequence
+
+
+class SendResult:
+    """Truthy when the webhook accepted the upload, so it can stand in for the old bool."""
+
+    __slots__ = ("ok", "status", "headers", "attachments", "pending")
+
+    def __init__(self, ok: bool, status: int = 0,
+                 headers: Optional[Mapping[str, str]] = None,
+                 attachments: Sequence[str] = (), pending: bool = False):
+        self.ok      = ok
+        self.status  = status
+        self.headers = headers or {}
+        # CDN URLs of the uploaded files, when the webhook returned the message.
+        self.attachments = tuple(attachments)
+        # Not accepted yet, but the upload will be tried again (e.g. from the outbox).
+        self.pending = pending
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    def __repr__(self) -> str:
+        return f"SendResult(ok={self.ok}, status={self.status})"
+
+    @property
+    def throttled(self) -> bool:
+        return self.status == 429
+
+    @classmethod
+    def coerce(cls, value) -> "SendResult":
+        """Wrap the plain bool returned by older ISender implementations."""
+        return value if isinstance(value, cls) else cls(bool(value))
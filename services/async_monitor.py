@@ -0,0 +1,347 @@
+"""
+services/async_monitor.py
+-------------------------
+AsyncMonitoringService: the monitoring loop on one asyncio event loop.
+"""
+
+import asyncio
+import time
+from threading import Event, Thread
+from typing import List, Optional, Set
+
+from models.send_result import SendResult
+from services.async_sender import AsyncSender
+from services.batcher import Batch
+from services.lister import FolderListers
+from services.monitor import _CONGESTION_ERRORS, _MAX_THROTTLE_RETRIES, _OUTBOX_POLL, \
+    MonitoringService
+from services.payload import Payload
+from services.scanner import FolderScanner
+from services.settle import SettleQueue
+from services.watcher import InotifyWatcher
+
+# How often an upload waiting for a concurrency slot looks again.
+_SLOT_POLL = 0.05
+
+
+class _LoopQueue:
+    """`put()` from any thread into an asyncio.Queue, for the watcher's callbacks."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self._loop  = loop
+        self._queue = queue
+
+    def put(self, item) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+
+class _Deliveries:
+    """Delivery tasks of one run: at most `workers` send at a time, the rest wait their turn."""
+
+    def __init__(self, workers: int, backlog: int, stopped: Event):
+        self.tasks: Set[asyncio.Task] = set()
+        self.active: Set[asyncio.Task] = set()  # holding a sender slot
+        self.stopped = stopped
+        self.slots   = asyncio.Semaphore(workers)
+        self.workers = workers
+        self.backlog = backlog
+        self.drained = asyncio.Event()
+
+    @property
+    def queued(self) -> int:
+        return max(0, len(self.tasks) - self.workers)
+
+    def add(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(task)
+        self.drained.clear()
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if len(self.tasks) <= self.workers + self.backlog:
+            self.drained.set()
+
+    async def room(self) -> None:
+        """Wait while more deliveries are pending than the send queue may hold."""
+        while len(self.tasks) > self.workers + self.backlog:
+            self.drained.clear()
+            await self.drained.wait()
+
+
+class AsyncMonitoringService(MonitoringService):
+    """
+    Same contract as MonitoringService, but detection, batching and every
+    upload are coroutines on a single event loop running in one thread, so
+    a large fan-out costs tasks rather than threads. Folders are listed by
+    FolderListers; other blocking disk work runs through asyncio.to_thread.
+    Uploads are native when aiohttp is installed (see AsyncSender) and fall
+    back to the blocking sender in worker threads otherwise.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: Optional[_Deliveries] = None
+        self._send_args: tuple = ()
+
+    def start(self, folders: list, webhooks: list, settings: dict, debug: bool) -> None:
+        scanner, workers = self._prepare(folders, webhooks, settings, debug)
+        Thread(target=self._run,
+               args=(folders, webhooks, settings, debug, scanner, workers, self._stopped),
+               daemon=True).start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._running = False
+            self._stopped.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+    def _run(self, *args) -> None:
+        try:
+            asyncio.run(self._main(*args))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._failed(e, args[-1])
+
+    async def _main(self, folders, webhooks, settings, debug, scanner: FolderScanner,
+                    workers: int, stopped: Event) -> None:
+        loop = asyncio.get_running_loop()
+        self._loop, self._task = loop, asyncio.current_task()
+        watcher: Optional[InotifyWatcher] = None
+        listers: Optional[FolderListers]  = None
+        sender:  Optional[AsyncSender]    = None
+        jobs:    Optional[_Deliveries]    = None
+        try:
+            file_delay = float(settings.get("file_delay", 0.8))
+            events: asyncio.Queue = asyncio.Queue()
+            await asyncio.to_thread(self._snapshot, folders, self._formats(settings))
+            scanned   = self._trie.scanned
+            to_loop   = _LoopQueue(loop, events)
+            watcher, polled = await asyncio.to_thread(self._start_watcher, scanned, settings,
+                                                      to_loop)
+            watched   = [fc for fc in scanned if not any(fc is p for p in polled)]
+            settle    = SettleQueue(file_delay)
+            batcher   = self._batcher(settings)
+            schedule  = self._scheduler(settings, polled)
+            listers   = FolderListers(scanner, self._folder_rules,
+                                      lambda listing: to_loop.put(("listing", listing)),
+                                      self._deadline)
+            self._catch_up(watched, listers)
+            rescan:   set = set()
+            sender    = AsyncSender(self._sender)
+            await sender.open()
+            jobs = self._deliveries = _Deliveries(
+                workers, max(1, int(settings.get("send_queue_size", 100))), stopped)
+            send_args = (sender, webhooks,
+                         int(settings.get("send_timeout", 30)),
+                         float(settings.get("sound_volume", 0.8)),
+                         bool(settings.get("link_fanout", False))
+                         and self._sender.supports_links)
+            self._send_args = send_args
+            scan      = 0
+            next_retry = time.monotonic() if self._outbox is not None else None
+            if debug:
+                self._on_log("asyncio engine, uploads "
+                             + ("native" if sender.native else "in worker threads"), "debug")
+            while self._running:
+                next_scan = schedule.next_due()
+                if next_scan is not None and time.monotonic() >= next_scan:
+                    due_folders = schedule.due()
+                    scan += 1
+                    if debug:
+                        self._on_log(f"Scan #{scan}  ({len(due_folders)} folder(s), "
+                                     f"{jobs.queued} queued for sending)", "debug")
+                    for fc in due_folders:
+                        listers.request(fc, full=self._full(fc))
+                    next_scan = schedule.next_due()
+                sweep = self._sweep(watched, listers)
+                for fc in listers.overdue():
+                    self._set_degraded(fc, True)
+                hang = listers.next_deadline()
+                due = settle.next_due()
+                if due is not None and time.monotonic() >= due:
+                    for abs_fp, size, fc in await asyncio.to_thread(settle.poll):
+                        self._stage(jobs, batcher, abs_fp, size, fc, None)
+                    due = settle.next_due()
+                if next_retry is not None and time.monotonic() >= next_retry:
+                    for path, size, fc, targets in await asyncio.to_thread(
+                            self._due_retries, folders, webhooks):
+                        self._stage(jobs, batcher, path, size, fc, targets)
+                    next_retry = time.monotonic() + _OUTBOX_POLL
+                batch_due = batcher.next_due()
+                if batch_due is not None and time.monotonic() >= batch_due:
+                    for batch in batcher.poll():
+                        self._enqueue(jobs, batch)
+                    batch_due = batcher.next_due()
+                # Backpressure: stop detecting while the send queue is full.
+                if len(jobs.tasks) > jobs.workers + jobs.backlog:
+                    if debug:
+                        self._on_log(f"Send queue full ({jobs.backlog}), waiting for senders",
+                                     "debug")
+                    await jobs.room()
+                deadlines = [t for t in (next_scan, due, next_retry, batch_due, hang, sweep)
+                             if t is not None]
+                wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=wait)
+                except asyncio.TimeoutError:
+                    continue
+                if not self._running:
+                    break
+                kind, payload = event
+                if kind == "file":
+                    path, fc = payload
+                    await asyncio.to_thread(self._detect, path, fc, settle)
+                elif kind == "listing":
+                    # Every file is looked up in the seen index, so keep it off the loop.
+                    await asyncio.to_thread(self._handle_listing, payload, schedule, settle)
+                    self._relist(payload[0], listers, rescan)
+                elif kind == "overflow":
+                    self._on_log("File event queue overflowed, rescanning watched folders", "warn")
+                    self._rescan(watched, listers, rescan)
+                elif kind == "fallback" and any(payload is fc for fc in watched):
+                    watched = [fc for fc in watched if fc is not payload]
+                    schedule.add(payload)
+                    self._on_log(f"Watch limit reached, polling {payload['path']}", "warn")
+        finally:
+            if listers is not None:
+                listers.stop()
+            if watcher is not None:
+                watcher.stop()
+            if jobs is not None:
+                # Deliveries still waiting for a slot were never marked seen, so
+                # the next run resends them. Uploads already under way are let
+                # finish, as the threaded engine's senders are: a blocking upload
+                # in a worker thread completes even when its task is cancelled.
+                for task in list(jobs.tasks):
+                    if task not in jobs.active:
+                        task.cancel()
+                await asyncio.gather(*jobs.tasks, return_exceptions=True)
+            if sender is not None:
+                await sender.close()
+            if self._content is not None:
+                self._content.shutdown_pool()
+            self._loop = self._task = None
+
+    # ── Send stage ───────────────────────────────────────────────────────────
+
+    def _enqueue(self, jobs: _Deliveries, batch: Batch) -> bool:
+        """Start a delivery task for a batch; it waits for a free sender slot."""
+        files, (fc, targets) = batch
+        if not self._running:
+            with self._lock:
+                self._inflight.difference_update(fp for fp, _ in files)
+            return False
+        jobs.add(self._deliver_async(jobs, files, fc, targets, *self._send_args))
+        self._report_counters()
+        return True
+
+    def _report_counters(self) -> None:
+        jobs = self._deliveries
+        self._on_counters(self._sent_count, self._fail_count, jobs.queued if jobs else 0,
+                          len(self._outbox) if self._outbox is not None else 0)
+
+    async def _deliver_async(self, jobs: _Deliveries, files: list, fc: dict,
+                             targets: Optional[list], sender: AsyncSender, webhooks,
+                             timeout, volume, link_fanout: bool) -> None:
+        try:
+            async with jobs.slots:
+                if jobs.stopped.is_set():
+                    return
+                task = asyncio.current_task()
+                jobs.active.add(task)
+                try:
+                    with self._uploading_files(files):
+                        await self._deliver_batch(files, fc, targets, sender, webhooks,
+                                                  timeout, volume, link_fanout)
+                finally:
+                    jobs.active.discard(task)
+        except Exception as e:
+            self._on_log(f"Error sending {', '.join(fp for fp, _ in files)}: {e}", "err")
+        finally:
+            self._release(files, jobs.stopped)
+            self._report_counters()
+
+    async def _deliver_batch(self, files: list, fc: dict, targets: Optional[list],
+                             sender: AsyncSender, webhooks, timeout, volume,
+                             link_fanout: bool) -> None:
+        job = await asyncio.to_thread(self._begin_delivery, files, fc, targets, webhooks)
+        if job is None:
+            return
+        paths, total, webhooks, reposts = job
+        folder_path = fc["path"]
+        payload = Payload(paths, total)
+        try:
+            if reposts is not None:
+                results = list(await asyncio.gather(*(
+                    self._send_async(sender, payload, wh, folder_path, timeout, reposts)
+                    for wh in webhooks)))
+            elif link_fanout and len(webhooks) > 1:
+                first = await self._send_async(sender, payload, webhooks[0], folder_path,
+                                               timeout, wait=True)
+                links = list(first.attachments)
+                rest  = await asyncio.gather(*(
+                    self._send_async(sender, payload, wh, folder_path, timeout,
+                                     links if len(links) == len(paths) else None)
+                    for wh in webhooks[1:]))
+                results = [first, *rest]
+            else:
+                results = list(await asyncio.gather(*(
+                    self._send_async(sender, payload, wh, folder_path, timeout)
+                    for wh in webhooks)))
+        finally:
+            payload.close()
+        await asyncio.to_thread(self._finish_delivery, paths, fc, results, volume)
+
+    async def _send_async(self, sender: AsyncSender, payload: Payload, wh: dict,
+                          folder_path: str, timeout: int, links: Optional[List[str]] = None,
+                          wait: bool = False) -> SendResult:
+        """
+        Coroutine twin of MonitoringService._send_to_webhook: the same
+        `_record_*` helpers decide what a result means, only the waiting differs.
+        """
+        paths = payload.paths
+        url   = wh.get("url", "")
+        name  = wh.get("name", "?")
+        username, avatar_url = self._identity(wh)
+
+        if not self._breaker.allow(url):
+            return await asyncio.to_thread(self._record_deferred, paths, wh, folder_path)
+        try:
+            for attempt in range(_MAX_THROTTLE_RETRIES + 1):
+                while not self._concurrency.try_acquire(url):
+                    await asyncio.sleep(_SLOT_POLL)
+                ok, congested, started = False, False, time.monotonic()
+                try:
+                    delay = self._limiter.try_acquire(url)
+                    while delay > 0:
+                        await asyncio.sleep(delay)
+                        delay = self._limiter.try_acquire(url)
+                    started = time.monotonic()
+                    if links:
+                        result = await sender.send_links(url, links, timeout,
+                                                         username=username, avatar_url=avatar_url)
+                    else:
+                        result = await sender.send_payload(payload, url, timeout,
+                                                           username=username,
+                                                           avatar_url=avatar_url,
+                                                           wait=wait or self._dedup == "link")
+                    ok, congested = bool(result), result.throttled
+                except _CONGESTION_ERRORS:
+                    congested = True
+                    raise
+                finally:
+                    # Also runs on cancellation, so a stopped run never leaks a slot.
+                    self._release_slot(url, name, ok, congested, started, payload.size)
+                done = await asyncio.to_thread(self._record_response, paths, wh, folder_path,
+                                               result, links, attempt)
+                if done is not None:
+                    return done
+            return await asyncio.to_thread(self._record_throttled, paths, wh, folder_path)
+        except Exception as e:
+            return await asyncio.to_thread(self._record_error, paths, wh, folder_path, e)
@@ -0,0 +1,114 @@
+"""
+services/async_sender.py
+------------------------
+AsyncSender: awaitable uploads for the asyncio monitoring engine.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import requests
+
+from core.events import ISender
+from models.send_result import SendResult
+from services.payload import _CHUNK, _THROTTLED_CHUNK, Payload
+from services.sender import HttpSender
+
+try:
+    import aiohttp
+    _AIOHTTP_OK = True
+except ImportError:
+    _AIOHTTP_OK = False
+
+
+class AsyncSender:
+    """
+    Awaitable front for an ISender. With aiohttp installed and an HttpSender
+    behind it, uploads are non-blocking requests on the event loop that reuse
+    the HttpSender's pool size, keep-alive and bandwidth settings. Otherwise
+    each call runs the blocking sender in a worker thread.
+    """
+
+    def __init__(self, sender: ISender):
+        self._sender  = sender
+        self._native  = _AIOHTTP_OK and isinstance(sender, HttpSender)
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    @property
+    def native(self) -> bool:
+        return self._native
+
+    async def open(self) -> None:
+        if self._native and self._session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self._sender.pool_size,
+                                             force_close=not self._sender.keep_alive)
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def send_payload(self, payload: Payload, url: str, timeout: int,
+                           username: str = "", avatar_url: str = "",
+                           wait: bool = False) -> SendResult:
+        if self._session is None:
+            return SendResult.coerce(await asyncio.to_thread(
+                self._sender.send_payload, payload, url, timeout,
+                username=username, avatar_url=avatar_url, wait=wait))
+        # Laying out the body reads the files, so keep it off the loop.
+        reader    = await asyncio.to_thread(payload.reader, username, avatar_url)
+        throttles = self._sender.throttles(url)
+        size      = _THROTTLED_CHUNK if throttles else _CHUNK
+
+        async def body():
+            while True:
+                chunk = await asyncio.to_thread(reader.read, size)
+                if not chunk:
+                    return
+                pause = max((b.reserve(len(chunk)) for b in throttles), default=0.0)
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                yield chunk
+
+        headers = {"Content-Type": payload.content_type, "Content-Length": str(len(reader))}
+        async with self._request(url, timeout, data=body(), headers=headers,
+                                 params={"wait": "true"} if wait else None) as r:
+            ok = r.status in (200, 201, 204)
+            attachments: List[str] = []
+            if ok and wait:
+                try:
+                    message = await r.json(content_type=None)
+                    attachments = [a["url"] for a in message.get("attachments", ())]
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    pass
+            return SendResult(ok, r.status, r.headers, attachments)
+
+    async def send_links(self, url: str, links: List[str], timeout: int,
+                         username: str = "", avatar_url: str = "") -> SendResult:
+        if self._session is None:
+            return SendResult.coerce(await asyncio.to_thread(
+                self._sender.send_links, url, links, timeout,
+                username=username, avatar_url=avatar_url))
+        message = {"embeds": [{"image": {"url": link}} for link in links[:10]]}
+        if username:   message["username"]   = username
+        if avatar_url: message["avatar_url"] = avatar_url
+        async with self._request(url, timeout, json=message) as r:
+            return SendResult(r.status in (200, 201, 204), r.status, r.headers)
+
+    @asynccontextmanager
+    async def _request(self, url: str, timeout: int, **kwargs):
+        """
+        POST on the session. Failures, including those while the body is sent
+        or the response read, surface as the requests exceptions the monitor
+        handles.
+        """
+        try:
+            async with self._session.post(url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                          **kwargs) as r:
+                yield r
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(str(e) or "Request timed out") from e
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError) as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
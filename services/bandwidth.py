@@ -0,0 +1,36 @@
+"""
+services/bandwidth.py
+---------------------
+TokenBucket: caps upload throughput in bytes per second.
+"""
+
+import time
+from threading import Lock
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Byte-rate limiter in virtual-scheduling form: `consume(n)` reserves n
+    bytes at the bucket's rate and sleeps until they are due, allowing a burst
+    of up to `burst` bytes after idle time. Reservations are granted in arrival
+    order, so uploads that read in small chunks share the rate evenly.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self._rate  = max(1.0, float(rate))
+        self._burst = float(burst) if burst is not None else self._rate / 4
+        self._lock  = Lock()
+        self._due   = 0.0  # monotonic time at which the bucket is empty again
+
+    def reserve(self, n: int) -> float:
+        """Reserve `n` bytes; returns the seconds to wait before sending them."""
+        with self._lock:
+            now       = time.monotonic()
+            self._due = max(self._due, now - self._burst / self._rate) + n / self._rate
+            return max(0.0, self._due - now)
+
+    def consume(self, n: int) -> None:
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,58 @@
+"""
+services/batcher.py
+-------------------
+Batcher: groups settled files into multi-attachment uploads.
+"""
+
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# (files as [(path, size), ...], payload)
+Batch = Tuple[List[Tuple[str, int]], Any]
+
+
+class Batcher:
+    """
+    Open batches keyed by destination (folder + webhooks). A batch is released
+    as soon as it holds `max_files` files, when the next file would push it past
+    `max_bytes`, or once its first file has waited `window` seconds. With
+    `max_files` 1 every file is released on its own, immediately.
+    """
+
+    def __init__(self, max_files: int = 1, max_bytes: int = 0, window: float = 0.0):
+        self._max_files = max(1, int(max_files))
+        self._max_bytes = max(0, int(max_bytes))
+        self._window    = max(0.0, window)
+        # key -> [files, total_bytes, opened_at, payload]
+        self._open: Dict[Hashable, list] = {}
+
+    def add(self, key: Hashable, path: str, size: int, payload: Any) -> List[Batch]:
+        """Add a file to the batch for `key`; returns the batches this closed."""
+        ready = []
+        entry = self._open.get(key)
+        if entry is not None and self._max_bytes and entry[1] + size > self._max_bytes:
+            ready.append(self._close(key))
+            entry = None
+        if entry is None:
+            entry = self._open[key] = [[], 0, time.monotonic(), payload]
+        entry[0].append((path, size))
+        entry[1] += size
+        if len(entry[0]) >= self._max_files or self._window <= 0:
+            ready.append(self._close(key))
+        return ready
+
+    def next_due(self) -> Optional[float]:
+        """Monotonic time the oldest open batch is due, or None when there is none."""
+        if not self._open:
+            return None
+        return min(entry[2] for entry in self._open.values()) + self._window
+
+    def poll(self) -> List[Batch]:
+        """Close and return every batch whose window has expired."""
+        now = time.monotonic()
+        return [self._close(key) for key, entry in list(self._open.items())
+                if now - entry[2] >= self._window]
+
+    def _close(self, key: Hashable) -> Batch:
+        files, _, __, payload = self._open.pop(key)
+        return files, payload
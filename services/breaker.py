@@ -0,0 +1,95 @@
+"""
+services/breaker.py
+-------------------
+CircuitBreaker: stops uploading to webhooks that keep failing.
+"""
+
+import time
+from threading import Lock
+from typing import Dict
+
+CLOSED    = "closed"
+OPEN      = "open"
+HALF_OPEN = "half-open"
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at")
+
+    def __init__(self):
+        self.state     = CLOSED
+        self.failures  = 0
+        self.opened_at = 0.0
+
+
+class CircuitBreaker:
+    """
+    One circuit per webhook URL. `threshold` consecutive failures open it;
+    while open, `allow()` refuses uploads without touching the network until
+    `probe_interval` seconds have passed, then lets a single probe through
+    (half-open). The probe's success closes the circuit, its failure opens it
+    for another interval. A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, threshold: int = 5, probe_interval: float = 60.0):
+        self._lock = Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+        self.configure(threshold, probe_interval)
+
+    def configure(self, threshold: int, probe_interval: float) -> None:
+        self._threshold      = max(0, int(threshold))
+        self._probe_interval = max(1.0, float(probe_interval))
+
+    def _circuit(self, url: str) -> _Circuit:
+        circuit = self._circuits.get(url)
+        if circuit is None:
+            circuit = self._circuits[url] = _Circuit()
+        return circuit
+
+    def allow(self, url: str) -> bool:
+        if not self._threshold:
+            return True
+        with self._lock:
+            circuit = self._circuit(url)
+            if circuit.state == CLOSED:
+                return True
+            # Open, or half-open with a probe that never reported back: after
+            # another interval the next upload becomes the probe.
+            if time.monotonic() - circuit.opened_at < self._probe_interval:
+                return False
+            circuit.state     = HALF_OPEN
+            circuit.opened_at = time.monotonic()
+            return True
+
+    def success(self, url: str) -> None:
+        with self._lock:
+            circuit = self._circuit(url)
+            circuit.state    = CLOSED
+            circuit.failures = 0
+
+    def failure(self, url: str) -> bool:
+        """Count a failed upload; returns True if this opened the circuit."""
+        if not self._threshold:
+            return False
+        with self._lock:
+            circuit = self._circuit(url)
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or (circuit.state == CLOSED
+                                              and circuit.failures >= self._threshold):
+                tripped = circuit.state == CLOSED
+                circuit.state     = OPEN
+                circuit.opened_at = time.monotonic()
+                return tripped
+            return False
+
+    def retry_in(self, url: str) -> float:
+        """Seconds until an open circuit lets its next probe through."""
+        with self._lock:
+            circuit = self._circuits.get(url)
+            if circuit is None or circuit.state == CLOSED:
+                return 0.0
+            return max(0.0, circuit.opened_at + self._probe_interval - time.monotonic())
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {url: c.state for url, c in self._circuits.items()}
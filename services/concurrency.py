@@ -0,0 +1,100 @@
+"""
+services/concurrency.py
+-----------------------
+AdaptiveConcurrency: AIMD limit on parallel uploads per webhook.
+"""
+
+import time
+from threading import Condition
+from typing import Callable, Dict, Optional
+
+# Latency is compared per MiB so large files do not look like a slow server.
+_MIB = 1024 * 1024
+
+
+class _Window:
+    __slots__ = ("limit", "inflight", "baseline", "cut_at")
+
+    def __init__(self, limit: float):
+        self.limit    = limit
+        self.inflight = 0
+        self.baseline = 0.0
+        self.cut_at   = 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    Per-URL cap on uploads in flight, tuned by additive increase /
+    multiplicative decrease: every healthy success adds 1/limit (about +1 per
+    round of uploads), a 429, timeout or connection error halves the limit
+    (once per round: uploads already in flight at the cut do not cut again).
+    A success is healthy while its latency per MiB stays within `tolerance`
+    times the best recently seen; slower ones hold the limit where it is.
+    """
+
+    def __init__(self, maximum: int = 4, initial: float = 2.0, tolerance: float = 2.0):
+        self._cond = Condition()
+        self._windows: Dict[str, _Window] = {}
+        self._initial   = initial
+        self._tolerance = tolerance
+        self.configure(maximum)
+
+    def configure(self, maximum: int, enabled: bool = True) -> None:
+        with self._cond:
+            self._maximum = max(1, int(maximum))
+            self._enabled = enabled
+            for window in self._windows.values():
+                window.limit = min(window.limit, self._maximum)
+            self._cond.notify_all()
+
+    def _window(self, url: str) -> _Window:
+        window = self._windows.get(url)
+        if window is None:
+            window = self._windows[url] = _Window(min(self._initial, self._maximum))
+        return window
+
+    def try_acquire(self, url: str) -> bool:
+        """Take a slot for `url` if one is free, without waiting."""
+        with self._cond:
+            window = self._window(url)
+            if not self._enabled or window.inflight < int(window.limit):
+                window.inflight += 1
+                return True
+            return False
+
+    def acquire(self, url: str, stopped: Callable[[], bool]) -> bool:
+        """Wait for a free slot for `url`; returns False if `stopped()` turns true first."""
+        with self._cond:
+            while not stopped():
+                if self.try_acquire(url):
+                    return True
+                self._cond.wait(0.5)
+        return False
+
+    def release(self, url: str, ok: bool, congested: bool,
+                started: float, size: int) -> Optional[int]:
+        """
+        Free a slot taken at monotonic time `started` and adapt the limit;
+        returns the new limit if it changed.
+        """
+        now = time.monotonic()
+        with self._cond:
+            window = self._window(url)
+            window.inflight = max(0, window.inflight - 1)
+            before = int(window.limit)
+            if congested:
+                if started >= window.cut_at:
+                    window.limit  = max(1.0, window.limit / 2)
+                    window.cut_at = now
+            elif ok:
+                sample = (now - started) / max(1.0, size / _MIB)
+                if not window.baseline or sample < window.baseline:
+                    window.baseline = sample
+                else:
+                    # Let the baseline follow a server that got slower for good.
+                    window.baseline += (sample - window.baseline) * 0.05
+                if sample <= window.baseline * self._tolerance:
+                    window.limit = min(float(self._maximum), window.limit + 1 / window.limit)
+            self._cond.notify_all()
+            after = int(window.limit)
+            return after if after != before and self._enabled else None
@@ -0,0 +1,211 @@
+"""
+services/content_index.py
+-------------------------
+ContentIndex: content hashes of delivered files, to avoid uploading an image twice.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from threading import RLock
+from typing import Dict, List, Optional, Tuple
+
+from services.scanner import FileKey, file_key
+
+try:
+    from xxhash import xxh3_128 as _xxh3_128
+except ImportError:
+    _xxh3_128 = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS digests (
+    inode  TEXT    NOT NULL,
+    size   INTEGER NOT NULL,
+    mtime  INTEGER NOT NULL,
+    digest TEXT    NOT NULL,
+    PRIMARY KEY (inode, size, mtime)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deliveries (
+    digest TEXT NOT NULL,
+    url    TEXT NOT NULL,
+    path   TEXT NOT NULL,
+    link   TEXT,
+    linked REAL,
+    PRIMARY KEY (digest, url)
+) WITHOUT ROWID;
+"""
+
+# Digests carry the algorithm, so installing xxhash later never matches old ones.
+_ALGORITHM = "xxh3" if _xxh3_128 is not None else "blake2b"
+# Files this large are hashed in a worker process; smaller ones in the calling thread.
+_POOL_THRESHOLD = 4 * 1024 * 1024
+_POOL_WORKERS   = max(1, min(4, (os.cpu_count() or 2) - 1))
+# A worker that has not answered by then (e.g. it could not start) is given up on.
+_POOL_TIMEOUT   = 30.0
+_CHUNK = 1024 * 1024
+# Discord signs attachment URLs for 24 hours; older links are not reused.
+LINK_TTL = 20 * 3600.0
+
+
+def hash_file(path: str) -> str:
+    h = _xxh3_128() if _xxh3_128 is not None else hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_CHUNK), b""):
+            h.update(chunk)
+    return f"{_ALGORITHM}:{h.hexdigest()}"
+
+
+class ContentIndex:
+    """
+    sqlite-backed record of which content (by hash) went to which webhook.
+
+    `digests()` hashes files with xxh3 when the optional `xxhash` package is
+    installed (blake2b otherwise), caching each digest by the file's inode,
+    size and mtime so a file is only read once; large files are hashed in a
+    small process pool, started on first use and stopped by
+    `shutdown_pool()`. `record()` remembers a delivery and, if known, the
+    attachment URL it produced and when; `earlier()` answers whether some
+    content already reached every given webhook.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = RLock()
+        self._db:   Optional[sqlite3.Connection] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_ok = True
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self._path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def close(self) -> None:
+        self.shutdown_pool()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ── Hashing ──────────────────────────────────────────────────────────────
+
+    def digests(self, paths: List[str]) -> Dict[str, str]:
+        """Digest of every readable file in `paths`."""
+        keys: Dict[str, FileKey] = {}
+        for path in paths:
+            try:
+                keys[path] = file_key(os.stat(path))
+            except OSError:
+                continue
+        found: Dict[str, str] = {}
+        with self._lock:
+            db = self._conn()
+            for path, (dev, ino, size, mtime) in keys.items():
+                row = db.execute(
+                    "SELECT digest FROM digests WHERE inode = ? AND size = ? AND mtime = ?",
+                    (f"{dev}:{ino}", size, mtime)).fetchone()
+                if row and row[0].startswith(_ALGORITHM + ":"):
+                    found[path] = row[0]
+        todo = [path for path in keys if path not in found]
+        # Large files go to the pool first, so they hash while small ones are read here.
+        futures: Dict[str, Future] = {}
+        for path in todo:
+            if keys[path][2] >= _POOL_THRESHOLD:
+                pool = self._get_pool()
+                if pool is not None:
+                    futures[path] = pool.submit(hash_file, path)
+        fresh: Dict[str, str] = {}
+        for path in todo:
+            try:
+                fresh[path] = futures[path].result(_POOL_TIMEOUT) if path in futures \
+                    else hash_file(path)
+                continue
+            except FutureTimeout:  # an OSError on Python 3.11+, so caught first
+                futures[path].cancel()
+            except OSError:
+                continue
+            except Exception:
+                pass
+            # Broken, stopped or stuck pool: hash this one here and stop using the pool.
+            self._pool_ok = False
+            try:
+                fresh[path] = hash_file(path)
+            except OSError:
+                continue
+        if fresh:
+            with self._lock:
+                db = self._conn()
+                with db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)",
+                        ((f"{keys[p][0]}:{keys[p][1]}", keys[p][2], keys[p][3], digest)
+                         for p, digest in fresh.items()))
+        found.update(fresh)
+        return found
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._pool is None and self._pool_ok:
+                try:
+                    # "spawn": forking a process that runs Tk and sender threads is not safe.
+                    self._pool = ProcessPoolExecutor(
+                        _POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+                except (OSError, NotImplementedError, ImportError):
+                    self._pool_ok = False
+            return self._pool if self._pool_ok else None
+
+    def shutdown_pool(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._pool_ok = True
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # ── Deliveries ───────────────────────────────────────────────────────────
+
+    def earlier(self, digest: str, urls: List[str],
+                link_ttl: Optional[float] = None) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        (path, attachment URL or None) of an earlier delivery of `digest` if it
+        went to every one of `urls`, else None. With `link_ttl`, a delivery
+        whose links are all older than that many seconds counts as absent, so
+        the content is uploaded again rather than posted as a dead link.
+        """
+        if not urls:
+            return None
+        with self._lock:
+            rows = self._conn().execute(
+                f"SELECT url, path, link, linked FROM deliveries WHERE digest = ? "
+                f"AND url IN ({','.join('?' * len(urls))}) ORDER BY linked DESC",
+                (digest, *urls)).fetchall()
+        if len({url for url, _, _, _ in rows}) < len(set(urls)):
+            return None
+        link, linked = next(((link, linked) for _, _, link, linked in rows if link),
+                            (None, None))
+        if link is not None and link_ttl is not None \
+                and time.time() - (linked or 0.0) > link_ttl:
+            return None
+        return rows[0][1], link
+
+    def record(self, digest: str, url: str, path: str, link: Optional[str]) -> None:
+        """
+        Remember that `url` received `digest`; the first path is kept, and the
+        newest known link along with when it was recorded.
+        """
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute(
+                    "INSERT INTO deliveries (digest, url, path, link, linked) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (digest, url) DO UPDATE SET "
+                    "link = COALESCE(excluded.link, link), "
+                    "linked = COALESCE(excluded.linked, linked)",
+                    (digest, url, path, link, time.time() if link else None))
@@ -0,0 +1,99 @@
+"""
+services/lister.py
+------------------
+FolderListers: lists each folder on its own thread, with a deadline.
+"""
+
+import os
+import queue
+import time
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.pathfilter import PathFilter
+from services.scanner import FileKey, FolderScanner
+
+# (folder config, image files, complete, error) delivered when a listing
+# finishes; an incomplete listing left out directories that did not change.
+Listing = Tuple[dict, List[Tuple[str, FileKey]], bool, Optional[Exception]]
+
+
+class FolderListers:
+    """
+    One daemon thread per folder lists it on `request()` and hands the result
+    to `on_done`. A stale network mount that blocks in os.scandir therefore
+    only stalls its own folder: `overdue()` reports listings running past the
+    deadline so the caller can mark the folder degraded, and a folder is not
+    listed again until its previous listing returns. With an incremental
+    scanner, listings only carry the files of changed directories unless a
+    full one is requested.
+    """
+
+    def __init__(self, scanner: FolderScanner,
+                 rules: Callable[[dict], Optional[PathFilter]],
+                 on_done: Callable[[Listing], None], deadline: float):
+        self._scanner  = scanner
+        self._rules    = rules
+        self._on_done  = on_done
+        self._deadline = max(1.0, float(deadline))
+        self._lock     = Lock()
+        self._queues:  Dict[int, queue.Queue] = {}
+        self._started: Dict[int, Tuple[float, dict]] = {}  # id(fc) -> (monotonic start, fc)
+        self._overdue: set = set()
+
+    def request(self, fc: dict, full: bool = False) -> bool:
+        """Start listing `fc`; returns False if its previous listing is still running."""
+        with self._lock:
+            if id(fc) in self._started:
+                return False
+            self._started[id(fc)] = (time.monotonic(), fc)
+            jobs = self._queues.get(id(fc))
+            if jobs is None:
+                jobs = self._queues[id(fc)] = queue.Queue()
+                Thread(target=self._work, args=(jobs,), daemon=True,
+                       name=f"wis-list-{os.path.basename(fc['path'])}").start()
+        jobs.put((fc, full))
+        return True
+
+    def overdue(self) -> List[dict]:
+        """Folders whose listing just went past the deadline (each reported once per listing)."""
+        now = time.monotonic()
+        late = []
+        with self._lock:
+            for key, (started, fc) in self._started.items():
+                if now - started > self._deadline and key not in self._overdue:
+                    self._overdue.add(key)
+                    late.append(fc)
+        return late
+
+    def next_deadline(self) -> Optional[float]:
+        """Monotonic time at which the oldest unreported listing becomes overdue."""
+        with self._lock:
+            starts = [started for key, (started, _) in self._started.items()
+                      if key not in self._overdue]
+        return min(starts) + self._deadline if starts else None
+
+    def stop(self) -> None:
+        # A thread stuck on a hung mount exits once its listing returns.
+        with self._lock:
+            queues, self._queues = list(self._queues.values()), {}
+        for jobs in queues:
+            jobs.put(None)
+
+    def _work(self, jobs: queue.Queue) -> None:
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            fc, full = job
+            files: List[Tuple[str, FileKey]] = []
+            error: Optional[Exception] = None
+            try:
+                files = list(self._scanner.iter_images(fc["path"], fc.get("recursive", False),
+                                                       self._rules(fc), changed_only=not full))
+            except Exception as e:
+                error = e
+            with self._lock:
+                self._started.pop(id(fc), None)
+                self._overdue.discard(id(fc))
+            self._on_done((fc, files, full or not self._scanner.incremental, error))
@@ -5,16 +5,35 @@ MonitoringService: the background thread that scans folders and sends images.
 """
 
 import os
+import queue
 import time
-from threading import Thread
-from typing import Callable, Tuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import requests
 
 from core.config import DEFAULTS, _SCRIPT_DIR
 from core.events import ISender, IAudioPlayer
 from core.config import StatisticsStore
-from services.scanner import FolderScanner
+from models.send_result import SendResult
+from services.batcher import Batch, Batcher
+from services.breaker import CircuitBreaker
+from services.concurrency import AdaptiveConcurrency
+from services.content_index import LINK_TTL, ContentIndex
+from services.lister import FolderListers, Listing
+from services.outbox import Outbox
+from services.pathfilter import PathFilter
+from services.payload import Payload
+from services.ratelimit import RateLimiter
+from services.roots import RootTrie
+from services.scanner import FileKey, FolderScanner, file_key
+from services.schedule import ScanScheduler
+from services.seen_index import SeenIndex
+from services.seen_set import SeenSet
+from services.settle import SettleQueue
+from services.watcher import InotifyWatcher
 
 
 _SEND_ERRORS: Tuple = (
@@ -22,6 +41,19 @@ _SEND_ERRORS: Tuple = (
     (requests.exceptions.ConnectionError, "Connection error", "Connection Error"),
 )
 
+# A throttled upload is retried after its Retry-After this many times before
+# it is recorded as failed.
+_MAX_THROTTLE_RETRIES = 5
+
+# Failures that mean the webhook is overloaded: back off its concurrency.
+_CONGESTION_ERRORS: Tuple = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+# Responses that mean the webhook itself is gone or unauthorized.
+_DEAD_STATUSES = (401, 403, 404)
+
+# How often due outbox retries are picked up (seconds).
+_OUTBOX_POLL = 1.0
+
 
 class MonitoringService:
     def __init__(self,
@@ -29,128 +61,1044 @@ class MonitoringService:
                  audio:       IAudioPlayer,
                  stats:       StatisticsStore,
                  on_log:      Callable[[str, str], None],
-                 on_counters: Callable[[int, int], None]):
+                 on_counters: Callable[[int, int, int, int], None],
+                 seen_index:  Optional[SeenIndex] = None,
+                 outbox:      Optional[Outbox] = None,
+                 on_folders:  Optional[Callable[[List[str]], None]] = None,
+                 content:     Optional[ContentIndex] = None,
+                 on_stopped:  Optional[Callable[[], None]] = None):
         self._sender      = sender
         self._audio       = audio
         self._stats       = stats
         self._on_log      = on_log
         self._on_counters = on_counters
+        self._on_folders  = on_folders
+        self._on_stopped  = on_stopped  # a run ended without stop(), e.g. its loop failed
         self._running     = False
-        self._sent_files: set = set()
+        self._index       = seen_index
+        self._outbox      = outbox
+        self._content     = content
+        self._dedup: Optional[str] = None  # None, "skip" or "link"
+        self._digests: Dict[str, str] = {}  # path being sent -> content digest
+        self._sending: Dict[str, str] = {}  # digest being sent -> path carrying it
+        self._relinked: set = set()         # duplicates being posted as links
+        self._seen:   Dict[str, SeenSet] = {}
+        self._rules:  Dict[str, Optional[PathFilter]] = {}
+        self._roots:  Dict[int, str] = {}  # id(folder config) -> absolute root
+        self._trie    = RootTrie([])
+        self._loaded: set = set()
+        self._degraded: Dict[str, float] = {}   # folder path -> monotonic time it hung
+        self._unsnapshotted: Dict[str, Optional[str]] = {}  # root -> index scope still owed
+        self._guests: Dict[int, List[dict]] = {}  # id(host) -> folders its walk lists
+        self._resumed: set = set()  # roots resumed from the index without a listing
+        self._started_ns  = 0  # wall clock at start(): files modified since are never snapshotted
+        self._deadline    = 30.0
+        self._sweep_every = 600.0
+        self._swept: Dict[int, float] = {}  # id(fc) -> monotonic time of its last full listing
+        self._seen_budget = 0
         self._sent_count  = 0
         self._fail_count  = 0
+        self._lock        = Lock()
+        self._seen_lock   = Lock()
+        self._inflight:   set = set()
+        # Paths being uploaded right now, by this run or one still stopping.
+        self._uploading:  set = set()
+        self._stopped     = Event()  # set by stop(); each run gets its own
+        self._events: queue.Queue = queue.Queue()
+        self._jobs:   queue.Queue = queue.Queue()
+        # Rate limits and circuits are server state, so they outlive a single run.
+        self._limiter = RateLimiter()
+        self._breaker = CircuitBreaker()
+        self._concurrency = AdaptiveConcurrency()
+        self._deferred: set = set()  # (path, url) deferrals already recorded while the circuit is open
+        self._debug   = False
 
     @property
     def running(self) -> bool:
         return self._running
 
+    def breaker_states(self) -> Dict[str, str]:
+        """Circuit state ("closed", "open", "half-open") of every webhook URL used so far."""
+        return self._breaker.states()
+
+    def degraded_folders(self) -> List[str]:
+        """Paths of folders whose listing is hung (e.g. a stale network mount)."""
+        with self._lock:
+            return list(self._degraded)
+
     def start(self, folders: list, webhooks: list, settings: dict, debug: bool) -> None:
-        self._running    = True
-        self._sent_count = 0
-        self._fail_count = 0
-        self._sent_files.clear()
-        scanner = FolderScanner(self._formats(settings))
-        self._snapshot(folders, scanner)
+        scanner, workers = self._prepare(folders, webhooks, settings, debug)
+        # Each run gets its own queues so a stopping loop or worker can never
+        # pick up work meant for the next one.
+        self._events = queue.Queue()
+        self._jobs   = queue.Queue(maxsize=max(1, int(settings.get("send_queue_size", 100))))
+        # Every sender fans a file out to all webhooks at once.
+        fanout = ThreadPoolExecutor(max_workers=workers * len(webhooks),
+                                    thread_name_prefix="wis-webhook") if len(webhooks) > 1 else None
+        send_args = (webhooks,
+                     int(settings.get("send_timeout", 30)),
+                     float(settings.get("sound_volume", 0.8)),
+                     fanout,
+                     bool(settings.get("link_fanout", False)) and self._sender.supports_links)
+        senders = [Thread(target=self._send_worker, args=(self._jobs, self._stopped, send_args),
+                          daemon=True)
+                   for _ in range(workers)]
+        for t in senders:
+            t.start()
         Thread(target=self._loop,
-               args=(folders, webhooks, settings, debug, scanner),
+               args=(folders, webhooks, settings, debug, scanner,
+                     self._events, self._jobs, senders, fanout, self._stopped),
                daemon=True).start()
 
     def stop(self) -> None:
-        self._running = False
+        with self._lock:
+            self._running = False
+            self._stopped.set()
+        self._events.put(None)
+
+    def _failed(self, e: Exception, stopped: Event) -> None:
+        """Report a monitoring loop that died and end its run, unless stop() already did."""
+        self._on_log(f"Monitoring loop failed: {e}", "err")
+        with self._lock:
+            if stopped.is_set():
+                return
+            self._running = False
+            stopped.set()
+        if self._on_stopped is not None:
+            self._on_stopped()
+
+    def _prepare(self, folders: list, webhooks: list, settings: dict,
+                 debug: bool) -> Tuple[FolderScanner, int]:
+        """Reset per-run state; returns the scanner and sender count."""
+        self._running    = True
+        self._sent_count = 0
+        self._fail_count = 0
+        self._seen     = {}
+        self._loaded   = set()
+        with self._lock:
+            # Swapped under the lock, so a sender still draining the previous
+            # run (see _send_worker) never releases this run's entries.
+            self._stopped  = Event()
+            self._inflight = set()
+            self._digests, self._sending, self._relinked = {}, {}, set()
+        self._dedup = None
+        if self._content is not None and settings.get("dedup_uploads", False):
+            links = settings.get("dedup_links", False) and self._sender.supports_links
+            self._dedup = "link" if links else "skip"
+        self._degraded = {}
+        self._unsnapshotted = {}
+        self._resumed  = set()
+        self._started_ns = time.time_ns()
+        self._deadline = max(1.0, float(settings.get("scan_deadline", 30.0)))
+        self._sweep_every = max(1.0, float(settings.get("sweep_interval",
+                                                        DEFAULTS["sweep_interval"])))
+        self._swept    = {}
+        self._report_folders()
+        # The budget only applies when the on-disk index can answer for evicted entries.
+        budget = float(settings.get("seen_cache_mb", DEFAULTS["seen_cache_mb"])) * 1024 * 1024
+        self._seen_budget = int(budget / max(1, len(folders))) if self._index else 0
+        self._trie  = RootTrie(folders)
+        self._roots = {id(fc): os.path.abspath(fc["path"]) for fc in folders}
+        self._rules = {os.path.abspath(fc["path"]): self._trie.rules(fc)
+                       for fc in folders if not self._trie.duplicate(fc)}
+        self._guests = {}
+        for fc in folders:
+            host = self._trie.host(fc)
+            if host is not None:
+                self._on_log(f"{fc['path']} is covered by {host['path']} and scanned with it",
+                             "debug")
+                if not self._trie.duplicate(fc):
+                    self._guests.setdefault(id(host), []).append(fc)
+        scanner = FolderScanner(self._formats(settings),
+                                incremental=bool(settings.get("incremental_scan", True)),
+                                workers=int(settings.get("scan_workers", 4)))
+        self._breaker.configure(int(settings.get("breaker_threshold", 5)),
+                                float(settings.get("breaker_probe_interval", 60.0)))
+        self._debug = debug
+        if self._outbox is not None:
+            # Claims are not released here: uploads of a run that is still
+            # stopping hold them until they are recorded (or _abandon()ed).
+            self._outbox.configure(int(settings.get("retry_attempts", 8)),
+                                   float(settings.get("retry_base_delay", 5.0)))
+            pending = len(self._outbox)
+            if pending:
+                self._on_log(f"Outbox: {pending} pending upload(s) from earlier runs", "info")
+        workers = max(1, int(settings.get("send_workers", 4)))
+        # A webhook never has more uploads in flight than there are senders.
+        self._concurrency.configure(workers, bool(settings.get("adaptive_concurrency", True)))
+        self._sender.limit_bandwidth(
+            float(settings.get("bandwidth_kbps", 0)) * 1024,
+            {wh.get("url", ""): float(wh.get("bandwidth_kbps") or 0) * 1024 for wh in webhooks})
+        if settings.get("http_prewarm", True):
+            Thread(target=self._sender.warm,
+                   args=([wh.get("url", "") for wh in webhooks],
+                         int(settings.get("send_timeout", 30))),
+                   daemon=True).start()
+        return scanner, workers
 
     @staticmethod
     def _formats(settings: dict) -> set:
         raw = settings.get("formats", DEFAULTS["formats"])
         return {e.strip().lower() for e in raw.split(",") if e.strip()}
 
-    def _snapshot(self, folders: list, scanner: FolderScanner) -> None:
-        new_files = {
-            os.path.abspath(fp)
-            for fc in folders
-            for fp in scanner.iter_images(fc["path"], fc.get("recursive", False))
-        }
-        self._sent_files.update(new_files)
-        self._on_log(f"Snapshot: {len(new_files)} existing file(s) marked as seen", "debug")
-
-    def _loop(self, folders, webhooks, settings, debug, scanner: FolderScanner) -> None:
-        scan_rate  = float(settings.get("scan_rate",  1.0))
-        file_delay = float(settings.get("file_delay", 0.8))
-        timeout    = int(settings.get("send_timeout", 30))
-        volume     = float(settings.get("sound_volume", 0.8))
-        scan = 0
-        while self._running:
-            scan += 1
-            if debug:
-                self._on_log(f"Scan #{scan}", "debug")
-            for fc in folders:
+    def _folder_rules(self, fc: dict) -> Optional[PathFilter]:
+        return self._rules.get(self._root(fc))
+
+    def _root(self, fc: dict) -> str:
+        root = self._roots.get(id(fc))
+        return root if root is not None else os.path.abspath(fc["path"])
+
+    def _seen_set(self, root: str) -> SeenSet:
+        seen = self._seen.get(root)
+        if seen is None:
+            seen = self._seen[root] = SeenSet(self._seen_budget)
+        return seen
+
+    def _walked_roots(self, fc: dict) -> List[str]:
+        """The roots a listing of `fc` covers: its own and those of the folders it hosts."""
+        return [self._root(f) for f in [fc] + self._guests.get(id(fc), [])]
+
+    def _owed(self, fc: dict) -> List[str]:
+        """Roots covered by a listing of `fc` that still owe their snapshot."""
+        if not self._unsnapshotted:
+            return []
+        return [root for root in self._walked_roots(fc) if root in self._unsnapshotted]
+
+    def _full(self, fc: dict) -> bool:
+        """
+        Whether the next listing of `fc` should be full: its snapshot is owed,
+        or its sweep is due. Other listings only carry changed directories, so
+        only full ones let the seen set drop the entries of deleted files.
+        """
+        now = time.monotonic()
+        if self._owed(fc) or now - self._swept.setdefault(id(fc), now) >= self._sweep_every:
+            self._swept[id(fc)] = now
+            return True
+        return False
+
+    def _sweep(self, watched: list, listers: FolderListers) -> Optional[float]:
+        """Fully list the watched folders due a sweep; returns when the next one is due."""
+        for fc in watched:
+            if self._full(fc):
+                listers.request(fc, full=True)
+        if not watched:
+            return None
+        return min(self._swept[id(fc)] for fc in watched) + self._sweep_every
+
+    def _snapshot(self, folders: list, formats: set) -> None:
+        """
+        Resume folders indexed with the same settings; every other folder takes
+        its snapshot from its first complete listing, on its own lister thread,
+        so a slow or hung folder holds up neither the start nor the others.
+        """
+        # Folders sharing a root share its seen set, so one of them is enough.
+        folders = [fc for fc in folders if not self._trie.duplicate(fc)]
+        resumed = 0
+        for fc in folders:
+            root  = os.path.abspath(fc["path"])
+            scope = None
+            if self._index is not None:
+                scope = f"{int(bool(fc.get('recursive', False)))}|{','.join(sorted(formats))}"
+                if PathFilter.signature(fc):
+                    scope += f"|{PathFilter.signature(fc)}"
+                if self._index.folder_scope(root) == scope:
+                    self._resumed.add(root)
+                    resumed += 1
+                    continue
+            self._unsnapshotted[root] = scope
+        if resumed:
+            self._on_log(f"Seen index: resumed {resumed} folder(s); files added while "
+                         f"stopped will be sent", "debug")
+
+    def _take_snapshot(self, root: str, scope: Optional[str],
+                       files: List[Tuple[str, FileKey]]) -> None:
+        """Mark a folder's existing files as seen without sending them."""
+        if self._index is not None:
+            self._index.replace_folder(root, scope, files)
+            self._loaded.add(root)
+        self._on_log(f"Snapshot: {len(files)} existing file(s) in "
+                     f"{os.path.basename(root) or root} marked as seen", "debug")
+        with self._seen_lock:
+            self._seen_set(root).update(key for _, key in files)
+
+    def _timeboxed(self, fn: Callable,
+                   calls: List[tuple]) -> List[Tuple[bool, Optional[BaseException]]]:
+        """
+        Run `fn(*args)` for every `args` in `calls`, each on its own daemon
+        thread, all within one scan deadline; returns (finished, error) per
+        call. Calls stuck on a hung mount are left behind.
+        """
+        boxes: List[list] = [[] for _ in calls]
+
+        def run(box: list, args: tuple):
+            try:
+                fn(*args)
+                box.append(None)
+            except BaseException as e:
+                box.append(e)
+
+        threads = [Thread(target=run, args=(box, args), daemon=True, name="wis-timeboxed")
+                   for box, args in zip(boxes, calls)]
+        for t in threads:
+            t.start()
+        until = time.monotonic() + self._deadline
+        for t in threads:
+            t.join(max(0.0, until - time.monotonic()))
+        return [(True, box[0]) if box else (False, None) for box in boxes]
+
+    def _set_degraded(self, fc: dict, hung: bool) -> None:
+        path = fc["path"]
+        with self._lock:
+            if hung == (path in self._degraded):
+                return
+            if hung:
+                self._degraded[path] = time.monotonic()
+            else:
+                since = self._degraded.pop(path)
+        if hung:
+            self._on_log(f"{path} is not responding (no listing within {self._deadline:.0f}s); "
+                         f"marked degraded, other folders keep running", "warn")
+        else:
+            self._on_log(f"{path} is responding again after {time.monotonic() - since:.0f}s",
+                         "info")
+        self._report_folders()
+
+    def _report_folders(self) -> None:
+        if self._on_folders is not None:
+            self._on_folders(self.degraded_folders())
+
+    def _is_seen(self, abs_fp: str, key: FileKey, root: str) -> bool:
+        with self._seen_lock:
+            seen = self._seen_set(root)
+            if key in seen:
+                return True
+            if self._index is None:
+                return False
+            if root not in self._loaded:
+                # First file of this folder in this run: pull its index entries in bulk.
+                self._loaded.add(root)
+                seen.update(self._index.iter_keys(root))
+                if key in seen:
+                    return True
+            if self._index.contains(key, root):
+                seen.add(key)
+                return True
+            if self._index.contains_path(abs_fp, key):
+                # Same file under a new inode number (e.g. a remounted share): re-key it.
+                self._index.add(abs_fp, key, root)
+                seen.add(key)
+                return True
+            return False
+
+    def _mark_seen(self, abs_fp: str, root: str) -> None:
+        try:
+            key = file_key(os.stat(abs_fp))
+        except OSError:
+            return
+        with self._seen_lock:
+            self._seen_set(root).add(key)
+        if self._index is not None:
+            self._index.add(abs_fp, key, root)
+
+    def _start_watcher(self, folders: list, settings: dict,
+                       events: queue.Queue) -> Tuple[Optional[InotifyWatcher], List[dict]]:
+        """Register inotify watches; returns the watcher and the folders left to poll."""
+        if not settings.get("use_inotify", True) or not InotifyWatcher.available():
+            return None, list(folders)
+        try:
+            watcher = InotifyWatcher(
+                self._formats(settings),
+                on_file=lambda path, fc: events.put(("file", (path, fc))),
+                on_overflow=lambda: events.put(("overflow", None)),
+                on_fallback=lambda fc: events.put(("fallback", fc)),
+            )
+        except OSError as e:
+            self._on_log(f"File events unavailable, polling all folders: {e}", "warn")
+            return None, list(folders)
+        polled = []
+        # Registering walks the folder, which can hang on a stale mount, so all
+        # folders register at once: hung mounts cost one deadline, not one each.
+        outcomes = self._timeboxed(watcher.add_folder,
+                                   [(fc, self._folder_rules(fc)) for fc in folders])
+        for fc, (finished, error) in zip(folders, outcomes):
+            if not finished:
+                self._set_degraded(fc, True)
+                polled.append(fc)
+            elif isinstance(error, OSError):
+                watcher.remove_folder(fc)
+                polled.append(fc)
+                self._on_log(f"Cannot watch {fc['path']}, polling instead: {error}", "warn")
+            elif error is not None:
+                watcher.stop()
+                raise error
+        watcher.start()
+        self._on_log(f"Watching {len(folders) - len(polled)} folder(s) for file events, "
+                     f"polling {len(polled)}", "debug")
+        return watcher, polled
+
+    def _loop(self, folders, webhooks, settings, debug, scanner: FolderScanner,
+              events: queue.Queue, jobs: queue.Queue, senders: List[Thread],
+              fanout: Optional[ThreadPoolExecutor], stopped: Event) -> None:
+        watcher: Optional[InotifyWatcher] = None
+        listers: Optional[FolderListers]  = None
+        try:
+            file_delay = float(settings.get("file_delay", 0.8))
+            self._snapshot(folders, self._formats(settings))
+            scanned   = self._trie.scanned
+            watcher, polled = self._start_watcher(scanned, settings, events)
+            watched   = [fc for fc in scanned if not any(fc is p for p in polled)]
+            settle    = SettleQueue(file_delay)
+            batcher   = self._batcher(settings)
+            schedule  = self._scheduler(settings, polled)
+            listers   = FolderListers(scanner, self._folder_rules,
+                                      lambda listing: events.put(("listing", listing)),
+                                      self._deadline)
+            self._catch_up(watched, listers)
+            rescan:   set = set()  # id(fc) of watched folders to list again once their listing returns
+            scan      = 0
+            next_retry = time.monotonic() if self._outbox is not None else None
+            while self._running:
+                next_scan = schedule.next_due()
+                if next_scan is not None and time.monotonic() >= next_scan:
+                    due_folders = schedule.due()
+                    scan += 1
+                    if debug:
+                        self._on_log(f"Scan #{scan}  ({len(due_folders)} folder(s), "
+                                     f"{jobs.qsize()} queued for sending)", "debug")
+                    # Each folder is listed on its own thread; the result comes back as a
+                    # "listing" event and reschedules the folder.
+                    for fc in due_folders:
+                        listers.request(fc, full=self._full(fc))
+                    next_scan = schedule.next_due()
+                sweep = self._sweep(watched, listers)
+                for fc in listers.overdue():
+                    self._set_degraded(fc, True)
+                hang = listers.next_deadline()
+                due = settle.next_due()
+                if due is not None and time.monotonic() >= due:
+                    for abs_fp, size, fc in settle.poll():
+                        if not self._stage(jobs, batcher, abs_fp, size, fc, None):
+                            break
+                    due = settle.next_due()
+                if next_retry is not None and time.monotonic() >= next_retry:
+                    self._enqueue_retries(jobs, batcher, folders, webhooks)
+                    next_retry = time.monotonic() + _OUTBOX_POLL
+                batch_due = batcher.next_due()
+                if batch_due is not None and time.monotonic() >= batch_due:
+                    for batch in batcher.poll():
+                        if not self._enqueue(jobs, batch):
+                            break
+                    batch_due = batcher.next_due()
+                deadlines = [t for t in (next_scan, due, next_retry, batch_due, hang, sweep)
+                             if t is not None]
+                wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
                 try:
-                    self._scan_folder(fc, webhooks, scanner, file_delay, timeout, volume)
-                except Exception as e:
-                    self._on_log(f"Error scanning {fc['path']}: {e}", "err")
-            time.sleep(scan_rate)
+                    event = events.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                if event is None or not self._running:
+                    break
+                kind, payload = event
+                if kind == "file":
+                    path, fc = payload
+                    self._detect(path, fc, settle)
+                elif kind == "listing":
+                    self._handle_listing(payload, schedule, settle)
+                    self._relist(payload[0], listers, rescan)
+                elif kind == "overflow":
+                    self._on_log("File event queue overflowed, rescanning watched folders", "warn")
+                    self._rescan(watched, listers, rescan)
+                elif kind == "fallback" and any(payload is fc for fc in watched):
+                    watched = [fc for fc in watched if fc is not payload]
+                    schedule.add(payload)
+                    self._on_log(f"Watch limit reached, polling {payload['path']}", "warn")
+        except Exception as e:
+            self._failed(e, stopped)
+        finally:
+            if listers is not None:
+                listers.stop()
+            if watcher is not None:
+                watcher.stop()
+            for _ in senders:
+                jobs.put(None)
+            for t in senders:
+                t.join()
+            if fanout is not None:
+                fanout.shutdown(wait=False)
+            if self._content is not None:
+                self._content.shutdown_pool()
 
-    def _scan_folder(self, fc, webhooks, scanner, file_delay, timeout, volume) -> None:
-        folder_path = fc["path"]
-        recursive   = fc.get("recursive", False)
-        base_name   = os.path.basename(folder_path)
-        for fp in scanner.iter_images(folder_path, recursive):
-            abs_fp = os.path.abspath(fp)
-            if abs_fp in self._sent_files:
-                continue
-            rel = os.path.relpath(abs_fp, folder_path)
-            self._on_log(f"New: {rel}  [{base_name}]", "info")
-            time.sleep(file_delay)
-            if not os.path.exists(abs_fp):
+    def _catch_up(self, watched: list, listers: FolderListers) -> None:
+        """
+        List watched folders that were resumed (or still owe their snapshot)
+        once: events only report what changes from now on, so files added
+        while WIS was stopped, or still queued when it stopped, would be missed.
+        """
+        for fc in watched:
+            if self._owed(fc) or any(r in self._resumed for r in self._walked_roots(fc)):
+                listers.request(fc, full=True)
+
+    def _rescan(self, folders: list, listers: FolderListers, rescan: set) -> None:
+        """
+        List watched folders again after file events were lost. Like polled
+        scans this runs on the listers, under their deadline; a folder whose
+        listing is already running (and may have passed the lost files) is
+        added to `rescan` and listed again when it returns.
+        """
+        for fc in folders:
+            if not listers.request(fc, full=self._full(fc)):
+                rescan.add(id(fc))
+
+    def _relist(self, fc: dict, listers: FolderListers, rescan: set) -> None:
+        """Start the rescan `fc` was waiting for, now that its listing returned."""
+        if id(fc) in rescan:
+            rescan.discard(id(fc))
+            self._rescan([fc], listers, rescan)
+
+    @staticmethod
+    def _scheduler(settings: dict, polled: list) -> ScanScheduler:
+        schedule = ScanScheduler(float(settings.get("scan_rate", 1.0)),
+                                 max_backoff=int(settings.get("scan_idle_backoff", 2)))
+        for fc in polled:
+            schedule.add(fc)
+        return schedule
+
+    # ── Send stage ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _batcher(settings: dict) -> Batcher:
+        if not settings.get("batch_uploads", False):
+            return Batcher()
+        return Batcher(int(settings.get("batch_max_files", 10)),
+                       int(float(settings.get("batch_max_mb", 8)) * 1024 * 1024),
+                       float(settings.get("batch_window", 0.5)))
+
+    def _stage(self, jobs: queue.Queue, batcher: Batcher, abs_fp: str, size: int,
+               fc: dict, targets: Optional[list]) -> bool:
+        """Add a settled file to its destination's batch and queue any batch that closed."""
+        with self._lock:
+            self._inflight.add(abs_fp)
+        key = (self._root(fc),
+               None if targets is None else tuple(wh.get("url", "") for wh in targets))
+        for batch in batcher.add(key, abs_fp, size, (fc, targets)):
+            if not self._enqueue(jobs, batch):
+                return False
+        return True
+
+    def _enqueue(self, jobs: queue.Queue, batch: Batch) -> bool:
+        """Hand a batch to the senders, blocking while the queue is full."""
+        files, (fc, targets) = batch
+        job = (files, fc, targets)
+        warned = False
+        while self._running:
+            try:
+                jobs.put(job, timeout=0.5)
+                self._report_counters()
+                return True
+            except queue.Full:
+                if not warned:
+                    self._on_log(f"Send queue full ({jobs.maxsize}), waiting for senders", "debug")
+                    warned = True
+        with self._lock:
+            self._inflight.difference_update(fp for fp, _ in files)
+        return False
+
+    def _enqueue_retries(self, jobs: queue.Queue, batcher: Batcher,
+                         folders: list, webhooks: list) -> None:
+        """Queue outbox deliveries whose backoff has expired."""
+        for path, size, fc, targets in self._due_retries(folders, webhooks):
+            if not self._stage(jobs, batcher, path, size, fc, targets):
+                return
+
+    def _due_retries(self, folders: list, webhooks: list) -> List[Tuple[str, int, dict, list]]:
+        """Claim due outbox deliveries; returns (path, size, folder, webhooks) per file."""
+        by_url  = {wh.get("url", ""): wh for wh in webhooks}
+        by_root = {os.path.abspath(fc["path"]): fc for fc in folders}
+        due: Dict[str, Tuple[str, set]] = {}
+        for path, folder, url in self._outbox.claim_due(list(by_url)):
+            due.setdefault(path, (folder, set()))[1].add(url)
+        retries = []
+        for path, (folder, urls) in due.items():
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            if size == 0:
+                self._outbox.drop(path)
+                self._on_log(f"Dropping retries, file gone or empty: {path}", "warn")
                 continue
+            fc      = by_root.get(folder) or {"path": folder}
+            targets = [wh for wh in webhooks if wh.get("url", "") in urls]
+            retries.append((path, size, fc, targets))
+        return retries
+
+    def _send_worker(self, jobs: queue.Queue, stopped: Event, send_args: tuple) -> None:
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            try:
+                # After stop() the backlog is drained without sending, even if a
+                # new run has started meanwhile; those files were never marked
+                # seen, so the next run's first listing of their folder picks them up.
+                if not stopped.is_set():
+                    with self._uploading_files(job[0]):
+                        self._deliver(*job, *send_args)
+            except Exception as e:
+                self._on_log(f"Error sending {', '.join(fp for fp, _ in job[0])}: {e}", "err")
+            finally:
+                self._release(job[0], stopped)
+                self._report_counters()
+
+    @contextmanager
+    def _uploading_files(self, files: list):
+        """
+        Keep `files` from being detected again until their upload is done:
+        unlike `_inflight`, this is not reset by a restart, so a file whose
+        upload outlives stop() is not sent a second time by the next run.
+        """
+        paths = [fp for fp, _ in files]
+        with self._lock:
+            self._uploading.update(paths)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._uploading.difference_update(paths)
+
+    def _release(self, files: list, stopped: Event) -> None:
+        """Drop a finished job's in-flight and digest claims, unless its run is over."""
+        with self._lock:
+            # A stopped run's sets were (or will be) replaced wholesale by the next one.
+            if not stopped.is_set():
+                self._inflight.difference_update(fp for fp, _ in files)
+                self._release_digests(fp for fp, _ in files)
+
+    def _report_counters(self) -> None:
+        self._on_counters(self._sent_count, self._fail_count, self._jobs.qsize(),
+                          len(self._outbox) if self._outbox is not None else 0)
+
+    def _handle_listing(self, listing: Listing, schedule: ScanScheduler,
+                        settle: SettleQueue) -> None:
+        """Take a finished background listing and schedule the folder's next scan."""
+        fc, files, complete, error = listing
+        self._set_degraded(fc, False)
+        if error is not None:
+            self._on_log(f"Error scanning {fc['path']}: {error}", "err")
+            schedule.done(fc, False)
+            return
+        schedule.done(fc, self._take_listing(fc, files, settle, complete) > 0)
+
+    def _take_listing(self, fc: dict, files: List[Tuple[str, FileKey]],
+                      settle: SettleQueue, complete: bool) -> int:
+        """
+        Run a folder's listing through detection; returns how many files are
+        new. `complete` says whether it holds every file or only those of
+        changed directories.
+        """
+        root = self._root(fc)
+        owed = self._owed(fc)
+        if owed:
+            # A folder's first complete listing is its snapshot: its existing
+            # files are marked as seen, not sent. Until then they are skipped.
+            # Files modified after start() are new, however late the listing.
+            taken: Dict[str, List[Tuple[str, FileKey]]] = {r: [] for r in owed}
+            rest = []
+            for fp, key in files:
+                snap = taken.get(self._root(self._trie.owner(fp, fc)))
+                if snap is None or key[3] >= self._started_ns:
+                    rest.append((fp, key))
+                else:
+                    snap.append((fp, key))
+            if complete:
+                for r, snap in taken.items():
+                    self._take_snapshot(r, self._unsnapshotted.pop(r), snap)
+            # Entries just added by the snapshot were not touched by this pass.
+            files, complete = rest, complete and root not in owed
+        with self._seen_lock:
+            seen  = self._seen_set(root)
+            since = seen.next_pass()
+        evicted = seen.evicted
+        found   = 0
+        for fp, key in files:
+            if not self._running:
+                return found
+            found += self._detect(fp, fc, settle, key)
+        if complete:
+            # Every existing file was looked up during the pass, so entries that
+            # were not touched belong to files that are gone.
+            with self._seen_lock:
+                seen.sweep(since)
+        if seen.evicted > evicted and evicted == 0:
+            self._on_log(f"Seen-file cache over budget for {fc['path']} "
+                         f"({len(seen)} entries); raise the cache size in Settings", "warn")
+        return found
+
+    def _detect(self, abs_fp: str, fc: dict, settle: SettleQueue,
+                key: Optional[FileKey] = None) -> bool:
+        """
+        Put a new file in the settle queue; returns False if it was already
+        known. `abs_fp` must be absolute (the scanner and watcher give them so).
+        """
+        fc = self._trie.owner(abs_fp, fc)
+        folder_path = fc["path"]
+        if abs_fp in settle or abs_fp in self._inflight or abs_fp in self._uploading:
+            return False
+        if key is None:
             try:
-                if os.path.getsize(abs_fp) == 0:
-                    self._on_log(f"Empty, skipping: {rel}", "warn")
+                key = file_key(os.stat(abs_fp))
+            except OSError:
+                return False
+        if self._is_seen(abs_fp, key, self._root(fc)):
+            return False
+        delay = fc.get("settle_delay")
+        if not settle.add(abs_fp, fc, None if delay in (None, "") else float(delay)):
+            return False
+        rel = os.path.relpath(abs_fp, folder_path)
+        self._on_log(f"New: {rel}  [{os.path.basename(folder_path)}]", "info")
+        return True
+
+    def _deliver(self, files: list, fc: dict, targets: Optional[list],
+                 webhooks, timeout, volume, fanout: Optional[ThreadPoolExecutor],
+                 link_fanout: bool = False) -> None:
+        job = self._begin_delivery(files, fc, targets, webhooks)
+        if job is None:
+            return
+        paths, total, webhooks, reposts = job
+        folder_path = fc["path"]
+        # The files are read once and the same bytes are posted to every webhook.
+        payload = Payload(paths, total)
+        try:
+            if reposts is not None:
+                results = self._fan_out(fanout, payload, webhooks, folder_path, timeout, reposts)
+            elif link_fanout and len(webhooks) > 1:
+                # Upload to the first webhook only and post the returned
+                # attachment URLs to the rest; without URLs, upload to all.
+                first = self._send_to_webhook(payload, webhooks[0], folder_path, timeout,
+                                              wait=True)
+                links = list(first.attachments)
+                results = [first] + self._fan_out(fanout, payload, webhooks[1:], folder_path,
+                                                  timeout, links if len(links) == len(paths)
+                                                  else None)
+            else:
+                results = self._fan_out(fanout, payload, webhooks, folder_path, timeout)
+        finally:
+            payload.close()
+        self._finish_delivery(paths, fc, results, volume)
+
+    def _begin_delivery(self, files: list, fc: dict, targets: Optional[list], webhooks: list
+                        ) -> Optional[Tuple[List[str], int, list, Optional[List[str]]]]:
+        """
+        Drop empty files and duplicates and journal the rest; returns (paths,
+        total size, webhooks, links), where `links` (if not None) are posted
+        instead of uploading the files.
+        """
+        folder_path = fc["path"]
+        root        = self._root(fc)
+        sizes: Dict[str, int] = {}
+        for abs_fp, size in files:
+            if size == 0:
+                rel = os.path.relpath(abs_fp, folder_path)
+                self._on_log(f"Empty, skipping: {rel}", "warn")
+            else:
+                sizes[abs_fp] = size
+        if not sizes:
+            return None
+        # A retry only goes to the webhooks that have not accepted the file yet.
+        webhooks = webhooks if targets is None else targets
+        paths, reposts = list(sizes), None
+        if self._dedup is not None:
+            paths, reposts = self._deduplicate(paths, fc, webhooks, targets is None)
+            if not paths:
+                return None
+        total = sum(sizes[fp] for fp in paths)
+        if self._outbox is not None and targets is None:
+            # Journal first: from here on the outbox, not the seen index, owns the retries.
+            urls = [wh.get("url", "") for wh in webhooks]
+            for abs_fp in paths:
+                self._outbox.add(abs_fp, root, urls)
+                self._mark_seen(abs_fp, root)
+        return paths, total, webhooks, reposts
+
+    # ── Deduplication ────────────────────────────────────────────────────────
+
+    def _deduplicate(self, paths: List[str], fc: dict, webhooks: list,
+                     check: bool) -> Tuple[List[str], Optional[List[str]]]:
+        """
+        Hash a batch and, with `check`, drop files whose content already went
+        to every webhook or is being sent right now. Returns the files still
+        to send and, when all of them are duplicates whose earlier upload left
+        an attachment URL that has not expired (and links are on), those URLs
+        to post instead.
+        """
+        digests = self._content.digests(paths)
+        urls    = [wh.get("url", "") for wh in webhooks]
+        ttl     = LINK_TTL if self._dedup == "link" else None
+        earlier = {fp: self._content.earlier(digest, urls, ttl)
+                   for fp, digest in digests.items()} if check else {}
+        uploads, reposts, skipped = [], [], []
+        with self._lock:
+            for fp in paths:
+                digest = digests.get(fp)
+                if digest is None:
+                    uploads.append(fp)
                     continue
-            except Exception:
-                continue
-            all_ok = all(
-                self._send_to_webhook(abs_fp, wh, folder_path, timeout) for wh in webhooks
-            )
-            self._sent_files.add(abs_fp)
-            # Sound files live next to main.py (two levels up from core/)
-            root_dir = os.path.normpath(os.path.join(_SCRIPT_DIR, ".."))
-            snd = os.path.join(root_dir, "validation.mp3" if all_ok else "exclamation.mp3")
-            if os.path.isfile(snd):
-                self._audio.play(snd, volume)
-            self._sent_count += all_ok
-            self._fail_count += not all_ok
-            self._on_counters(self._sent_count, self._fail_count)
-
-    def _send_to_webhook(self, abs_fp: str, wh: dict, folder_path: str, timeout: int) -> bool:
-        fname = os.path.basename(abs_fp)
-        url   = wh.get("url", "")
-        name  = wh.get("name", "?")
-        ext   = os.path.splitext(fname)[1].lower()
+                carrier = self._sending.get(digest)
+                prior   = earlier.get(fp)
+                if check and carrier is not None and carrier != fp:
+                    skipped.append((fp, carrier))
+                    continue
+                if prior is not None and (self._dedup == "skip" or prior[1] is None):
+                    skipped.append((fp, prior[0]))
+                    continue
+                self._digests[fp] = digest
+                if prior is not None:
+                    reposts.append((fp, prior[1]))
+                else:
+                    self._sending.setdefault(digest, fp)
+                    uploads.append(fp)
+            if not uploads:
+                self._relinked.update(fp for fp, _ in reposts)
+        for fp, first in skipped:
+            self._skip_duplicate(fp, first, fc, webhooks)
+        if uploads:
+            # Mixed with new files, duplicates go along as uploads.
+            return uploads + [fp for fp, _ in reposts], None
+        return [fp for fp, _ in reposts], [link for _, link in reposts] if reposts else None
+
+    def _skip_duplicate(self, abs_fp: str, first: str, fc: dict, webhooks: list) -> None:
+        self._mark_seen(abs_fp, self._root(fc))
+        base = os.path.basename(abs_fp)
+        self._on_log(f"Duplicate of {os.path.basename(first)}, skipped  {base}", "info")
+        for wh in webhooks:
+            self._stats.record_send(ok=False, file=base, webhook=wh.get("name", "?"),
+                                    folder=fc["path"], ext=os.path.splitext(base)[1].lower(),
+                                    deduplicated=True)
+
+    def _remember(self, paths: List[str], url: str, links: List[str]) -> None:
+        """Record a successful delivery of each file's content to `url`."""
+        if self._dedup is None:
+            return
+        with self._lock:
+            digests = [self._digests.get(fp) for fp in paths]
+        if len(links) != len(paths):
+            links = [None] * len(paths)
+        for fp, digest, link in zip(paths, digests, links):
+            if digest is not None:
+                self._content.record(digest, url, fp, link)
+
+    def _release_digests(self, paths: Iterable[str]) -> None:
+        """Forget the digests of finished deliveries; the caller holds self._lock."""
+        for fp in paths:
+            self._relinked.discard(fp)
+            digest = self._digests.pop(fp, None)
+            if digest is not None and self._sending.get(digest) == fp:
+                del self._sending[digest]
 
-        profile    = wh.get("_resolved_profile") or {}
-        username   = profile.get("username", "")
-        avatar_url = profile.get("avatar_url", "")
+    def _finish_delivery(self, paths: List[str], fc: dict, results: list, volume: float) -> None:
+        all_ok = all(results)
+        if not all_ok and not self._running:
+            # Interrupted by stop(): leave it unseen (or claimed in the outbox)
+            # so the next run retries it.
+            return
+        if self._outbox is None:
+            root = self._root(fc)
+            for abs_fp in paths:
+                self._mark_seen(abs_fp, root)
+        # Uploads the outbox will retry (deferred or backing off) are not
+        # outcomes yet: a file counts as failed once, when it is given up.
+        failed = any(not r and not r.pending for r in results)
+        if not all_ok and not failed:
+            return
+        # Sound files live next to main.py (two levels up from core/)
+        root_dir = os.path.normpath(os.path.join(_SCRIPT_DIR, ".."))
+        snd = os.path.join(root_dir, "validation.mp3" if all_ok else "exclamation.mp3")
+        if os.path.isfile(snd):
+            self._audio.play(snd, volume)
+        with self._lock:
+            self._sent_count += len(paths) if all_ok else 0
+            self._fail_count += len(paths) if failed else 0
+
+    def _fan_out(self, fanout: Optional[ThreadPoolExecutor], payload: Payload, webhooks: list,
+                 folder_path: str, timeout: int,
+                 links: Optional[List[str]] = None) -> List[SendResult]:
+        if fanout is None:
+            return [self._send_to_webhook(payload, wh, folder_path, timeout, links=links)
+                    for wh in webhooks]
+        # Deliver to every webhook even if one fails; latency is the slowest, not the sum.
+        futures = [fanout.submit(self._send_to_webhook, payload, wh, folder_path, timeout,
+                                 links=links)
+                   for wh in webhooks]
+        return [f.result() for f in futures]
+
+    def _release_slot(self, url: str, name: str, ok: bool, congested: bool,
+                      started: float, size: int) -> None:
+        limit = self._concurrency.release(url, ok, congested, started, size)
+        if limit is not None and self._debug:
+            self._on_log(f"Concurrency  {name}: up to {limit} upload(s) in flight", "debug")
+
+    @staticmethod
+    def _label(paths: List[str]) -> str:
+        fname = os.path.basename(paths[0])
+        return f"{fname} +{len(paths) - 1}" if len(paths) > 1 else fname
+
+    @staticmethod
+    def _identity(wh: dict) -> Tuple[str, str]:
+        profile = wh.get("_resolved_profile") or {}
+        return profile.get("username", ""), profile.get("avatar_url", "")
 
-        def _record(ok: bool, log_msg: str, log_kind: str,
-                    err_type: str = "", detail: str = "") -> bool:
+    def _record(self, paths: List[str], wh: dict, folder_path: str, ok: bool,
+                log_msg: str, log_kind: str, err_type: str = "", detail: str = "",
+                trip: bool = False, deferred: bool = False) -> SendResult:
+        """
+        Log one upload's outcome and update stats, the outbox and the webhook's
+        circuit. A deferral is logged and recorded once per file until the
+        circuit closes, not at every probe interval.
+        """
+        url  = wh.get("url", "")
+        name = wh.get("name", "?")
+        delays = []
+        with self._lock:
+            if deferred:
+                fresh = [fp for fp in paths if (fp, url) not in self._deferred]
+                self._deferred.update((fp, url) for fp in paths)
+            else:
+                fresh = paths
+                self._deferred.difference_update((fp, url) for fp in paths)
+        for abs_fp in paths:
+            if self._outbox is not None:
+                if ok:
+                    self._outbox.done(abs_fp, url)
+                elif deferred:
+                    self._outbox.defer(abs_fp, url, self._breaker.retry_in(url))
+                else:
+                    delays.append(self._outbox.failed(abs_fp, url, detail or err_type))
+        for abs_fp in fresh:
+            base = os.path.basename(abs_fp)
+            self._stats.record_send(ok=ok, file=base, webhook=name,
+                                    folder=folder_path, ext=os.path.splitext(base)[1].lower(),
+                                    err_type=err_type, detail=detail, deferred=deferred,
+                                    deduplicated=abs_fp in self._relinked)
+        if delays:
+            delay = delays[0]
+            log_msg += f", retry in {delay:.1f}s" if delay is not None else ", giving up"
+        if fresh:
             self._on_log(log_msg, log_kind)
-            self._stats.record_send(ok=ok, file=fname, webhook=name,
-                                    folder=folder_path, ext=ext,
-                                    err_type=err_type, detail=detail)
-            return ok
+        if ok:
+            self._breaker.success(url)
+            with self._lock:
+                self._deferred = {d for d in self._deferred if d[1] != url}
+        elif trip and self._breaker.failure(url):
+            self._on_log(f"Circuit opened for {name}: uploads deferred, next probe in "
+                         f"{self._breaker.retry_in(url):.0f}s", "warn")
+        # Only the outbox retries; without it a failed upload is final.
+        pending = self._outbox is not None and (deferred or (bool(delays)
+                                                             and None not in delays))
+        return SendResult(ok, pending=not ok and pending)
 
+    def _abandon(self, paths: List[str], url: str) -> SendResult:
+        """An upload given up by stop() before it was sent: due again for the next run."""
+        if self._outbox is not None:
+            for abs_fp in paths:
+                self._outbox.defer(abs_fp, url, 0.0)
+        return SendResult(False)
+
+    def _record_deferred(self, paths: List[str], wh: dict, folder_path: str) -> SendResult:
+        return self._record(paths, wh, folder_path, False,
+                            f"Deferred  {self._label(paths)}  →  {wh.get('name', '?')}  "
+                            f"(circuit open)", "warn", deferred=True)
+
+    def _record_response(self, paths: List[str], wh: dict, folder_path: str,
+                         result: SendResult, links: Optional[List[str]],
+                         attempt: int) -> Optional[SendResult]:
+        """
+        Act on a webhook's response: record a success or a failure and return
+        it, or return None after a 429 that is to be retried. Both engines use
+        this; they only differ in how they wait for the upload.
+        """
+        fname, name = self._label(paths), wh.get("name", "?")
+        url   = wh.get("url", "")
+        retry = self._limiter.update(url, result)
+        if result:
+            via = "  (link)" if links else ""
+            self._record(paths, wh, folder_path, True, f"{fname}  →  {name}{via}", "ok")
+            self._remember(paths, url, links or list(result.attachments))
+            return result
+        if not result.throttled:
+            return self._record_failure(paths, wh, folder_path, result)
+        if attempt < _MAX_THROTTLE_RETRIES:
+            self._on_log(f"Rate limited  {fname}  →  {name}, retrying in {retry:.1f}s", "warn")
+        return None
+
+    def _record_failure(self, paths: List[str], wh: dict, folder_path: str,
+                        result: SendResult) -> SendResult:
+        """Record a non-2xx, non-429 response."""
+        # Client errors about this particular upload say nothing about the webhook.
+        return self._record(paths, wh, folder_path, False,
+                            f"Non-2xx  {self._label(paths)}  →  {wh.get('name', '?')}", "err",
+                            "HTTP Error", f"HTTP {result.status}" if result.status
+                            else "Non-2xx response",
+                            trip=result.status in _DEAD_STATUSES or result.status >= 500
+                            or not result.status)
+
+    def _record_throttled(self, paths: List[str], wh: dict, folder_path: str) -> SendResult:
+        return self._record(paths, wh, folder_path, False,
+                            f"Rate limited  {self._label(paths)}  →  {wh.get('name', '?')}", "err",
+                            "Rate Limited", f"HTTP 429 after {_MAX_THROTTLE_RETRIES} retries")
+
+    def _record_error(self, paths: List[str], wh: dict, folder_path: str,
+                      e: Exception) -> SendResult:
+        fname, name = self._label(paths), wh.get("name", "?")
+        for exc_type, log_label, err_label in _SEND_ERRORS:
+            if isinstance(e, exc_type):
+                return self._record(paths, wh, folder_path, False,
+                                    f"{log_label}  {fname}  →  {name}", "err",
+                                    err_label, str(e)[:120], trip=True)
+        return self._record(paths, wh, folder_path, False, f"Error  {fname}  →  {name}: {e}",
+                            "err", type(e).__name__, str(e)[:120])
+
+    def _send_to_webhook(self, payload: Payload, wh: dict, folder_path: str, timeout: int,
+                         links: Optional[List[str]] = None, wait: bool = False) -> SendResult:
+        """
+        Upload one batch to one webhook; a batch of several files is a single
+        request. With `links` the files are posted by URL instead of uploaded.
+        """
+        paths = payload.paths
+        url   = wh.get("url", "")
+        name  = wh.get("name", "?")
+        username, avatar_url = self._identity(wh)
+
+        if not self._breaker.allow(url):
+            return self._record_deferred(paths, wh, folder_path)
         try:
-            ok = self._sender.send(abs_fp, url, timeout, username=username, avatar_url=avatar_url)
-            if ok:
-                return _record(True, f"{fname}  →  {name}", "ok")
-            return _record(False, f"Non-2xx  {fname}  →  {name}", "err",
-                           "HTTP Error", "Non-2xx response")
-        except tuple(exc for exc, _, __ in _SEND_ERRORS) as e:
-            for exc_type, log_label, err_label in _SEND_ERRORS:
-                if isinstance(e, exc_type):
-                    return _record(False, f"{log_label}  {fname}  →  {name}", "err",
-                                   err_label, str(e)[:120])
+            for attempt in range(_MAX_THROTTLE_RETRIES + 1):
+                if not self._concurrency.acquire(url, lambda: not self._running):
+                    return self._abandon(paths, url)
+                ok, congested, started = False, False, time.monotonic()
+                try:
+                    if not self._limiter.acquire(url, lambda: not self._running):
+                        return self._abandon(paths, url)
+                    started = time.monotonic()
+                    if links:
+                        result = self._sender.send_links(url, links, timeout,
+                                                         username=username, avatar_url=avatar_url)
+                    else:
+                        # With links on, uploads ask for the message back so a later
+                        # duplicate can be posted as a link to its attachment.
+                        result = self._sender.send_payload(payload, url, timeout,
+                                                           username=username,
+                                                           avatar_url=avatar_url,
+                                                           wait=wait or self._dedup == "link")
+                    result = SendResult.coerce(result)
+                    ok, congested = bool(result), result.throttled
+                except _CONGESTION_ERRORS:
+                    congested = True
+                    raise
+                finally:
+                    self._release_slot(url, name, ok, congested, started, payload.size)
+                done = self._record_response(paths, wh, folder_path, result, links, attempt)
+                if done is not None:
+                    return done
+            return self._record_throttled(paths, wh, folder_path)
         except Exception as e:
-            return _record(False, f"Error  {fname}  →  {name}: {e}", "err",
-                           type(e).__name__, str(e)[:120])
-        return False
+            return self._record_error(paths, wh, folder_path, e)
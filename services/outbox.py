@@ -0,0 +1,149 @@
+"""
+services/outbox.py
+------------------
+Outbox: durable journal of pending (file, webhook) deliveries with retries.
+"""
+
+import random
+import sqlite3
+import time
+from threading import RLock
+from typing import Iterable, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    path       TEXT    NOT NULL,
+    url        TEXT    NOT NULL,
+    folder     TEXT    NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    next_at    REAL,
+    last_error TEXT    NOT NULL DEFAULT '',
+    PRIMARY KEY (path, url)
+);
+CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries (next_at);
+"""
+
+_MAX_DELAY = 900.0
+
+
+class Outbox:
+    """
+    sqlite-backed outbox. A row is written for every webhook before a file is
+    uploaded and removed once that webhook accepted it, so a crash or outage
+    never loses a delivery. Rows being worked on have `next_at` NULL; failed
+    ones are rescheduled with exponential backoff and full jitter until
+    `max_attempts` is reached. Rows left claimed by an earlier process (a
+    crash, or an exit mid-upload) are due again as soon as the outbox opens.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 8, base_delay: float = 5.0):
+        self._path  = path
+        self._lock  = RLock()
+        self._db:   Optional[sqlite3.Connection] = None
+        self._count = 0
+        self.configure(max_attempts, base_delay)
+
+    def configure(self, max_attempts: int, base_delay: float) -> None:
+        self._max_attempts = max(0, int(max_attempts))
+        self._base_delay   = max(0.1, float(base_delay))
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self._path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            with db:
+                db.execute("UPDATE deliveries SET next_at = ? WHERE next_at IS NULL",
+                           (time.time(),))
+            self._count = db.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+            self._db = db
+        return self._db
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._conn()
+            return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ── Journal ──────────────────────────────────────────────────────────────
+
+    def add(self, path: str, folder: str, urls: Iterable[str]) -> None:
+        """Journal an upload of `path` to each URL; existing rows keep their attempts."""
+        urls = list(urls)
+        with self._lock:
+            db = self._conn()
+            with db:
+                cur = db.executemany(
+                    "INSERT OR IGNORE INTO deliveries (path, url, folder) VALUES (?, ?, ?)",
+                    ((path, url, folder) for url in urls))
+                added = cur.rowcount
+                db.executemany("UPDATE deliveries SET next_at = NULL WHERE path = ? AND url = ?",
+                               ((path, url) for url in urls))
+            self._count += max(0, added)
+
+    def done(self, path: str, url: str) -> None:
+        with self._lock:
+            db = self._conn()
+            with db:
+                cur = db.execute("DELETE FROM deliveries WHERE path = ? AND url = ?", (path, url))
+            self._count -= max(0, cur.rowcount)
+
+    def failed(self, path: str, url: str, error: str) -> Optional[float]:
+        """Reschedule a failed upload; returns the delay, or None once it is given up."""
+        with self._lock:
+            db  = self._conn()
+            row = db.execute("SELECT attempts FROM deliveries WHERE path = ? AND url = ?",
+                             (path, url)).fetchone()
+            if row is None:
+                return None
+            attempts = row[0] + 1
+            if attempts > self._max_attempts:
+                self.done(path, url)
+                return None
+            delay = random.uniform(0.5, 1.0) * min(_MAX_DELAY,
+                                                   self._base_delay * 2 ** (attempts - 1))
+            with db:
+                db.execute("UPDATE deliveries SET attempts = ?, next_at = ?, last_error = ? "
+                           "WHERE path = ? AND url = ?",
+                           (attempts, time.time() + delay, error[:200], path, url))
+            return delay
+
+    def defer(self, path: str, url: str, delay: float) -> None:
+        """Reschedule an upload that was not attempted; its attempt count is kept."""
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("UPDATE deliveries SET next_at = ? WHERE path = ? AND url = ?",
+                           (time.time() + delay, path, url))
+
+    def drop(self, path: str) -> int:
+        with self._lock:
+            db = self._conn()
+            with db:
+                cur = db.execute("DELETE FROM deliveries WHERE path = ?", (path,))
+            self._count -= max(0, cur.rowcount)
+            return cur.rowcount
+
+    # ── Scheduling ───────────────────────────────────────────────────────────
+
+    def claim_due(self, urls: List[str], limit: int = 100) -> List[Tuple[str, str, str]]:
+        """Take due deliveries for the given URLs; returns (path, folder, url) rows."""
+        if not urls:
+            return []
+        marks = ",".join("?" * len(urls))
+        with self._lock:
+            db   = self._conn()
+            rows = db.execute(
+                f"SELECT path, folder, url FROM deliveries WHERE next_at IS NOT NULL "
+                f"AND next_at <= ? AND url IN ({marks}) ORDER BY next_at LIMIT ?",
+                (time.time(), *urls, limit)).fetchall()
+            with db:
+                db.executemany("UPDATE deliveries SET next_at = NULL WHERE path = ? AND url = ?",
+                               ((path, url) for path, _, url in rows))
+            return rows
@@ -0,0 +1,155 @@
+"""
+services/pathfilter.py
+----------------------
+PathFilter: per-folder include/exclude rules and depth limit.
+"""
+
+import fnmatch
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Pattern
+
+# Patterns starting with this are regular expressions instead of globs.
+_REGEX_PREFIX = "re:"
+
+
+def _compile(patterns: Iterable[str]) -> Optional[Pattern]:
+    """Fold all patterns into one regex matched against a "/"-separated relative path."""
+    parts = []
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if pattern.startswith(_REGEX_PREFIX):
+            parts.append(pattern[len(_REGEX_PREFIX):])
+        elif "/" in pattern:
+            parts.append(fnmatch.translate(pattern.strip("/")))
+        else:
+            # A bare name matches at any depth.
+            parts.append(r"(?:.*/)?" + fnmatch.translate(pattern))
+    if not parts:
+        return None
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    return re.compile("|".join(f"(?:{p})" for p in parts), flags)
+
+
+def split_patterns(raw) -> List[str]:
+    """Patterns from a folder config value: a list, or one comma-separated string."""
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        raw = _split(raw)
+    return [p.strip() for p in raw if p and p.strip()]
+
+
+def _split(raw: str) -> List[str]:
+    """
+    Split on commas, except those a `re:` pattern holds inside (), [] or {}
+    or escapes as `\\,` (e.g. `re:img_\\d{1,3}\\.png` stays one pattern).
+    """
+    parts: List[str] = []
+    current: List[str] = []
+    depth, in_class, escaped = 0, False, False
+    for ch in raw:
+        if not "".join(current).lstrip().startswith(_REGEX_PREFIX):
+            if ch == ",":
+                parts.append("".join(current))
+                current = []
+            else:
+                current.append(ch)
+            continue
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch in "({":
+            depth += 1
+        elif ch in ")}":
+            depth = max(0, depth - 1)
+        elif ch == "," and not depth:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+
+def relative(prefix: str, path: str) -> str:
+    """`path` relative to a root given as `os.path.join(root, "")`, with "/" separators."""
+    rel = path[len(prefix):] if path.startswith(prefix) else os.path.basename(path)
+    return rel.replace(os.sep, "/") if os.sep != "/" else rel
+
+
+class PathFilter:
+    """
+    Include/exclude rules of one folder, compiled into one regex each. Paths
+    are relative to the folder root. A pattern without "/" is matched against
+    every name (e.g. `.thumbnails`, `*.tmp.png`), one with "/" against the
+    relative path (e.g. `raw/*`); `re:` patterns are regular expressions
+    matched from the start of the relative path. Excluded directories and
+    directories deeper than `max_depth` (0 = unlimited) are never descended
+    into; include patterns, if any, only apply to files. `skip` lists relative
+    directories to leave alone because another folder scans them; `guests`
+    maps relative directories whose files belong to another (non-recursive)
+    folder to that folder's rules (None: it has none), which decide its files.
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = (),
+                 max_depth: int = 0, skip: Iterable[str] = (),
+                 guests: Optional[Dict[str, Optional["PathFilter"]]] = None):
+        self._include   = _compile(include)
+        self._exclude   = _compile(exclude)
+        self._max_depth = max(0, int(max_depth or 0))
+        self._skip      = frozenset(skip)
+        self._guests    = dict(guests or {})
+
+    @classmethod
+    def for_folder(cls, fc: dict, skip: Iterable[str] = (),
+                   guests: Optional[Dict[str, Optional["PathFilter"]]] = None
+                   ) -> Optional["PathFilter"]:
+        """The folder's rules, or None if it has none."""
+        include = split_patterns(fc.get("include"))
+        exclude = split_patterns(fc.get("exclude"))
+        depth   = int(fc.get("max_depth") or 0)
+        skip    = tuple(skip)
+        if not include and not exclude and not depth and not skip and not guests:
+            return None
+        return cls(include, exclude, depth, skip, guests)
+
+    @staticmethod
+    def signature(fc: dict) -> str:
+        """Stable text form of a folder's rules ("" without rules), to notice when they change."""
+        include = split_patterns(fc.get("include"))
+        exclude = split_patterns(fc.get("exclude"))
+        depth   = int(fc.get("max_depth") or 0)
+        if not include and not exclude and not depth:
+            return ""
+        return ";".join((",".join(include), ",".join(exclude), str(depth)))
+
+    def covers(self, rel: str) -> bool:
+        """Whether a walk of the folder reaches the subdirectory at `rel` at all."""
+        parts = rel.split("/")
+        return all(self.allow_dir("/".join(parts[:i])) for i in range(1, len(parts) + 1))
+
+    def allow_dir(self, rel: str) -> bool:
+        """Whether to descend into the subdirectory at relative path `rel`."""
+        if rel in self._skip:
+            return False
+        if self._max_depth and rel.count("/") + 1 > self._max_depth:
+            return False
+        return self._exclude is None or not self._exclude.match(rel)
+
+    def allow_file(self, rel: str) -> bool:
+        if self._guests:
+            head, _, name = rel.rpartition("/")
+            if head in self._guests:
+                guest = self._guests[head]
+                return guest is None or guest.allow_file(name)
+        if self._exclude is not None and self._exclude.match(rel):
+            return False
+        return self._include is None or bool(self._include.match(rel))
@@ -0,0 +1,193 @@
+"""
+services/payload.py
+-------------------
+Payload: the multipart body of one upload, read once and shared by all webhooks.
+"""
+
+import json
+import mimetypes
+import os
+import uuid
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from services.bandwidth import TokenBucket
+
+# Files at least this large are streamed from disk instead of read into memory.
+_STREAM_THRESHOLD = 4 * 1024 * 1024
+# Largest chunk read from a streamed file at a time.
+_CHUNK = 64 * 1024
+# Largest chunk handed out by a throttled reader, to keep bandwidth sharing fine-grained.
+_THROTTLED_CHUNK = 16 * 1024
+
+
+class _FileSegment:
+    """A file that is streamed in `_CHUNK`-sized reads, never held in memory whole."""
+    __slots__ = ("path", "size")
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+
+Segment = Union[memoryview, _FileSegment]
+
+
+class BodyReader:
+    """
+    Read-only file-like object over a list of segments with a known total
+    length. In-memory segments are returned as memoryview slices of the shared
+    buffers; streamed files are read through this reader's own handle, so peak
+    memory per upload is one chunk however large the file is. Every chunk is
+    paid for in the given token buckets before it is handed to the socket.
+    """
+
+    def __init__(self, segments: List[Segment], throttles: Sequence[TokenBucket] = ()):
+        self._segments = segments
+        self._throttles = tuple(throttles)
+        self._length   = sum(len(seg) for seg in segments)
+        self._pos      = 0
+        self._index    = 0
+        self._offset   = 0
+        self._handles: Dict[int, object] = {}
+
+    def __len__(self) -> int:
+        return self._length
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._length}[whence]
+        self._pos = min(max(0, base + offset), self._length)
+        self._index, self._offset = 0, self._pos
+        while self._index < len(self._segments) \
+                and self._offset >= len(self._segments[self._index]):
+            self._offset -= len(self._segments[self._index])
+            self._index  += 1
+        return self._pos
+
+    def read(self, size: int = -1) -> Union[memoryview, bytes]:
+        """Return the next bytes, never crossing a segment (short reads are normal)."""
+        while self._index < len(self._segments):
+            seg = self._segments[self._index]
+            if self._offset < len(seg):
+                want = len(seg) - self._offset
+                if size is not None and size >= 0:
+                    want = min(want, size)
+                if self._throttles:
+                    want = min(want, _THROTTLED_CHUNK)
+                if isinstance(seg, _FileSegment):
+                    chunk = self._read_file(seg, min(want, _CHUNK))
+                else:
+                    chunk = seg[self._offset:self._offset + want]
+                self._offset += len(chunk)
+                self._pos    += len(chunk)
+                for bucket in self._throttles:
+                    bucket.consume(len(chunk))
+                return chunk
+            self._index, self._offset = self._index + 1, 0
+        self.close()
+        return memoryview(b"")
+
+    def _read_file(self, seg: _FileSegment, size: int) -> bytes:
+        fh = self._handles.get(self._index)
+        if fh is None:
+            fh = self._handles[self._index] = open(seg.path, "rb", buffering=0)
+        fh.seek(self._offset)
+        chunk = fh.read(size)
+        if len(chunk) < size:
+            # Content-Length is already on the wire; a short body must fail the upload.
+            raise IOError(f"{seg.path} shrank while it was being uploaded")
+        return chunk
+
+    def close(self) -> None:
+        handles, self._handles = self._handles, {}
+        for fh in handles.values():
+            fh.close()
+
+
+class Payload:
+    """
+    Files of one upload. Small files are read on first use and the multipart
+    body is laid out once per (username, avatar_url), so a file fanned out to
+    N webhooks costs one disk read. Files of `_STREAM_THRESHOLD` bytes or more
+    are streamed by each upload instead (the page cache keeps repeat reads
+    cheap). `reader()` hands each upload its own cursor; call `close()` when
+    every upload is done.
+    """
+
+    def __init__(self, file_paths: List[str], size: int = 0):
+        self.paths    = list(file_paths)
+        self.size     = size
+        self.boundary = uuid.uuid4().hex
+        self._lock    = Lock()
+        self._files:   Optional[List[Segment]] = None
+        self._readers: List[BodyReader] = []
+        self._bodies:  Dict[Tuple[str, str], List[Segment]] = {}
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def _load(self) -> List[Segment]:
+        if self._files is None:
+            files = []
+            for path in self.paths:
+                size = os.path.getsize(path)
+                if size >= _STREAM_THRESHOLD:
+                    files.append(_FileSegment(path, size))
+                else:
+                    with open(path, "rb") as fh:
+                        files.append(memoryview(fh.read()))
+            self._files = files
+        return self._files
+
+    def _part(self, name: str, filename: Optional[str], content_type: str) -> memoryview:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            # Same escaping as urllib3 (HTML5 form encoding).
+            quoted = filename.replace("\\", "\\\\").replace('"', "%22")
+            disposition += f'; filename="{quoted}"'
+        return memoryview(f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n"
+                          f"Content-Type: {content_type}\r\n\r\n".encode())
+
+    def _layout(self, username: str, avatar_url: str) -> List[Segment]:
+        segments = []
+        single   = len(self.paths) == 1
+        for i, (path, data) in enumerate(zip(self.paths, self._load())):
+            mime, _ = mimetypes.guess_type(path)
+            name    = "file" if single else f"files[{i}]"
+            segments += [self._part(name, os.path.basename(path),
+                                    mime or "application/octet-stream"),
+                         data, memoryview(b"\r\n")]
+        if username or avatar_url:
+            payload = {}
+            if username:   payload["username"]   = username
+            if avatar_url: payload["avatar_url"] = avatar_url
+            segments += [self._part("payload_json", None, "application/json"),
+                         memoryview(json.dumps(payload).encode() + b"\r\n")]
+        segments.append(memoryview(f"--{self.boundary}--\r\n".encode()))
+        return segments
+
+    def reader(self, username: str = "", avatar_url: str = "",
+               throttles: Sequence[TokenBucket] = ()) -> BodyReader:
+        with self._lock:
+            key  = (username, avatar_url)
+            body = self._bodies.get(key)
+            if body is None:
+                body = self._bodies[key] = self._layout(username, avatar_url)
+            reader = BodyReader(body, throttles)
+            self._readers.append(reader)
+        return reader
+
+    def close(self) -> None:
+        with self._lock:
+            self._bodies = {}
+            self._files  = None
+            readers, self._readers = self._readers, []
+        for reader in readers:
+            reader.close()
@@ -0,0 +1,121 @@
+"""
+services/ratelimit.py
+---------------------
+RateLimiter: schedules webhook uploads from Discord-style rate-limit headers.
+"""
+
+import time
+from threading import Condition
+from typing import Callable, Dict, Mapping, Optional
+
+from models.send_result import SendResult
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    value = headers.get(name)
+    return value if value is not None else headers.get(name.lower())
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _Bucket:
+    __slots__ = ("limit", "remaining", "reset_at", "window")
+
+    def __init__(self):
+        self.limit:     Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.window   = 0.0  # longest Reset-After seen: the window length, as best known
+
+
+class RateLimiter:
+    """
+    One token bucket per rate-limit bucket (`X-RateLimit-Bucket`), keyed by the
+    webhook URL until the server names its bucket. `acquire()` spends a token
+    and waits for the window to reset when none are left, so bursts run at the
+    allowed rate instead of provoking 429s; `update()` feeds the response
+    headers back and turns a 429's `Retry-After` into a pause for that bucket,
+    or for every bucket when the limit is global.
+    """
+
+    def __init__(self):
+        self._cond = Condition()
+        self._routes:  Dict[str, str]     = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._global_until = 0.0
+
+    def _bucket(self, url: str) -> _Bucket:
+        key    = self._routes.get(url, url)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        return bucket
+
+    def try_acquire(self, url: str) -> float:
+        """Spend a token for `url` if one is free; returns 0, or the seconds to wait first."""
+        with self._cond:
+            now    = time.monotonic()
+            bucket = self._bucket(url)
+            if bucket.reset_at and now >= bucket.reset_at:
+                # The new window's reset is not known until its first response
+                # comes back, so assume it lasts as long as the previous ones.
+                bucket.remaining = bucket.limit
+                bucket.reset_at  = now + bucket.window
+            wait = self._global_until - now
+            if bucket.remaining is not None and bucket.remaining <= 0 and bucket.reset_at:
+                wait = max(wait, bucket.reset_at - now)
+            if wait <= 0:
+                if bucket.remaining is not None:
+                    bucket.remaining -= 1
+                return 0.0
+            return wait
+
+    def acquire(self, url: str, stopped: Callable[[], bool]) -> bool:
+        """Block until `url` may be called; returns False if `stopped()` turns true first."""
+        with self._cond:
+            while not stopped():
+                wait = self.try_acquire(url)
+                if wait <= 0:
+                    return True
+                self._cond.wait(min(wait, 0.5))
+        return False
+
+    def update(self, url: str, result: SendResult) -> float:
+        """Record a response; returns the seconds to wait before retrying a throttled upload."""
+        headers = result.headers
+        with self._cond:
+            bucket_id = _header(headers, "X-RateLimit-Bucket")
+            if bucket_id:
+                self._routes[url] = bucket_id
+            bucket = self._bucket(url)
+            now    = time.monotonic()
+            limit       = _number(_header(headers, "X-RateLimit-Limit"))
+            remaining   = _number(_header(headers, "X-RateLimit-Remaining"))
+            reset_after = _number(_header(headers, "X-RateLimit-Reset-After"))
+            if limit is not None:
+                bucket.limit = int(limit)
+            if remaining is not None:
+                # Tokens reserved by uploads still in flight are not in the
+                # server's count yet, so never raise the local figure.
+                bucket.remaining = int(remaining) if bucket.remaining is None \
+                    else min(bucket.remaining, int(remaining))
+            if reset_after is not None:
+                bucket.reset_at = now + reset_after
+                bucket.window   = max(bucket.window, reset_after)
+            retry = 0.0
+            if result.throttled:
+                retry = _number(_header(headers, "Retry-After")) or reset_after or 1.0
+                scope = (_header(headers, "X-RateLimit-Scope") or "").lower()
+                if (_header(headers, "X-RateLimit-Global") or "").lower() == "true" \
+                        or scope == "global":
+                    self._global_until = max(self._global_until, now + retry)
+                else:
+                    bucket.remaining = 0
+                    bucket.reset_at  = max(bucket.reset_at, now + retry)
+            self._cond.notify_all()
+            return retry
@@ -0,0 +1,119 @@
+"""
+services/roots.py
+-----------------
+RootTrie: resolves overlapping watched folders so each directory is walked once.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+from services.pathfilter import PathFilter
+
+
+class _Node:
+    __slots__ = ("children", "folders")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.folders:  List[dict] = []
+
+
+class RootTrie:
+    """
+    Enabled folders arranged in a trie of their absolute paths. When a
+    recursive folder's walk would reach another folder's root, the nearer
+    folder wins:
+
+    - a nested recursive folder is skipped by the outer walk and scanned on
+      its own, so its subtree is listed once and follows its own schedule;
+    - a nested non-recursive folder is not scanned on its own at all: the
+      outer walk lists its directory and its files are attributed to it;
+    - folders sharing a root are merged into the first recursive one (or
+      the first one) among them.
+
+    `rules(fc)` gives each scanned folder its PathFilter, including the
+    nested roots to skip and the rules of the folders it lists; `owner(path, fc)` maps a detected file to the most
+    specific folder that covers it.
+    """
+
+    def __init__(self, folders: list):
+        self._root = _Node()
+        for fc in folders:
+            node = self._root
+            for part in self._parts(os.path.abspath(fc["path"])):
+                node = node.children.setdefault(part, _Node())
+            node.folders.append(fc)
+        self._skip:     Dict[int, List[str]] = {}
+        self._hosts:    Dict[int, dict] = {}
+        self._absorbed: Dict[str, dict] = {}  # directory -> non-recursive folder owning its files
+        self._guests:   Dict[int, Dict[str, dict]] = {}  # id(host) -> relative dir -> folder
+        self._duplicates: set = set()
+        for fc in folders:
+            self._place(fc)
+        self._scanned = [fc for fc in folders if id(fc) not in self._hosts]
+
+    @staticmethod
+    def _parts(path: str) -> List[str]:
+        return [p for p in path.split(os.sep) if p]
+
+    @staticmethod
+    def _primary(node: _Node) -> dict:
+        """Of several folders with the same root, the one that scans it."""
+        return next((fc for fc in node.folders if fc.get("recursive", False)), node.folders[0])
+
+    def _place(self, fc: dict) -> None:
+        root  = os.path.abspath(fc["path"])
+        parts = self._parts(root)
+        node  = self._root
+        host: Optional[dict] = None
+        depth = 0
+        # The nearest recursive ancestor whose walk reaches this root hosts it.
+        for i, part in enumerate(parts):
+            if node.folders:
+                other = self._primary(node)
+                if other.get("recursive", False) and self._reaches(other, parts[i:]):
+                    host, depth = other, i
+            node = node.children[part]
+        primary = self._primary(node)
+        if primary is not fc:
+            self._hosts[id(fc)] = primary
+            self._duplicates.add(id(fc))
+            return
+        if host is None:
+            return
+        rel = "/".join(parts[depth:])
+        if fc.get("recursive", False):
+            self._skip.setdefault(id(host), []).append(rel)
+        else:
+            self._hosts[id(fc)]   = host
+            self._absorbed[root] = fc
+            self._guests.setdefault(id(host), {})[rel] = fc
+
+    @staticmethod
+    def _reaches(fc: dict, rel_parts: List[str]) -> bool:
+        rules = PathFilter.for_folder(fc)
+        return rules is None or rules.covers("/".join(rel_parts))
+
+    @property
+    def scanned(self) -> List[dict]:
+        """Folders that are walked (and watched) on their own."""
+        return self._scanned
+
+    def host(self, fc: dict) -> Optional[dict]:
+        """The folder whose walk covers `fc`, if `fc` is not walked on its own."""
+        return self._hosts.get(id(fc))
+
+    def duplicate(self, fc: dict) -> bool:
+        """Whether `fc` shares its root with the folder that scans it."""
+        return id(fc) in self._duplicates
+
+    def rules(self, fc: dict) -> Optional[PathFilter]:
+        guests = {rel: PathFilter.for_folder(guest)
+                  for rel, guest in self._guests.get(id(fc), {}).items()}
+        return PathFilter.for_folder(fc, self._skip.get(id(fc), ()), guests)
+
+    def owner(self, abs_fp: str, fc: dict) -> dict:
+        """The most specific folder a file found while walking `fc` belongs to."""
+        if not self._absorbed:
+            return fc
+        return self._absorbed.get(os.path.dirname(abs_fp), fc)
@@ -5,24 +5,228 @@ FolderScanner: iterates image files inside a directory.
 """
 
 import os
+import time
+from collections import deque
+from functools import partial
+from threading import Condition, Lock, Thread
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.pathfilter import PathFilter, relative
+
+# A directory modified this recently may still change within the same mtime
+# tick, so its listing is not trusted on the next pass; the same goes for a
+# directory holding a file modified this recently, whose key may still change.
+_MTIME_SLACK_NS = 2_000_000_000
+
+# (st_dev, st_ino, size, mtime_ns): identifies a file's content by the inode it
+# lives in rather than by the path it was reached through.
+FileKey = Tuple[int, int, int, int]
+
+Listing = Tuple[List[Tuple[str, FileKey]], List[str]]
+Descend = Optional[Callable[[str], bool]]
+
+
+def file_key(st: os.stat_result) -> FileKey:
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _entry_key(entry: os.DirEntry) -> FileKey:
+    st = entry.stat()
+    if not st.st_ino:
+        # Windows leaves the file id out of DirEntry stats.
+        st = os.stat(entry.path)
+    return file_key(st)
 
 
 class FolderScanner:
-    def __init__(self, formats: set):
-        self._formats = formats
-
-    def iter_images(self, root: str, recursive: bool):
-        if recursive:
-            for dirpath, _, files in os.walk(root):
-                for fn in files:
-                    if os.path.splitext(fn)[1].lower() in self._formats:
-                        yield os.path.join(dirpath, fn)
+    """
+    Lists image files under a folder. With `workers` > 1, recursive folders
+    are listed by that many threads (os.scandir releases the GIL, so slow
+    network shares are listed concurrently); files still come out in the same
+    order as a single-threaded walk. A PathFilter prunes subdirectories before
+    they are listed and drops files it does not allow. Symlinked directories
+    are not followed.
+    """
+
+    def __init__(self, formats: set, incremental: bool = False, workers: int = 1):
+        self._formats     = formats
+        self._incremental = incremental
+        self._workers     = max(1, int(workers))
+        self._lock        = Lock()
+        # dir path -> (mtime_ns, inode, subdirectory paths); files are not
+        # cached, so the cache stays small however many images a tree holds.
+        self._dirs: Dict[str, Tuple[int, int, List[str]]] = {}
+
+    @property
+    def incremental(self) -> bool:
+        return self._incremental
+
+    def iter_images(self, root: str, recursive: bool, rules: Optional[PathFilter] = None,
+                    changed_only: bool = False):
+        """
+        (absolute path, FileKey) of every image file under `root`. A file
+        reached twice in one walk (hard links, a symlink to a file next to
+        it) is listed once. With `changed_only` in incremental mode, only the
+        files of directories that changed since they were last listed come
+        out; the rest of the tree is still walked for new subdirectories.
+        """
+        root  = os.path.abspath(root)
+        files = self._iter_images(root, recursive, None, changed_only)
+        if rules is not None:
+            prefix = os.path.join(root, "")
+            files  = ((fp, key) for fp, key in
+                      self._iter_images(root, recursive,
+                                        lambda d: rules.allow_dir(relative(prefix, d)),
+                                        changed_only)
+                      if rules.allow_file(relative(prefix, fp)))
+        inodes = set()
+        for fp, key in files:
+            inode = key[:2]
+            if inode not in inodes:
+                inodes.add(inode)
+                yield fp, key
+
+    def _iter_images(self, root: str, recursive: bool, descend: Descend, changed_only: bool):
+        lister = partial(self._list_dir, changed_only=changed_only) if self._incremental \
+            else self._list_uncached
+        if recursive and self._workers > 1:
+            yield from self._iter_parallel(root, lister, descend)
         else:
-            try:
-                with os.scandir(root) as it:
-                    for entry in it:
-                        if entry.is_file() and \
-                                os.path.splitext(entry.name)[1].lower() in self._formats:
-                            yield entry.path
-            except Exception:
-                pass
+            yield from self._iter_walk(root, recursive, lister, descend)
+
+    def _read_dir(self, path: str) -> Listing:
+        """Image files and real (non-symlink) subdirectories of `path`; raises OSError."""
+        files: List[Tuple[str, FileKey]] = []
+        subdirs: List[str] = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file() and \
+                            os.path.splitext(entry.name)[1].lower() in self._formats:
+                        files.append((entry.path, _entry_key(entry)))
+                except OSError:
+                    continue
+        return files, subdirs
+
+    def _list_uncached(self, path: str) -> Listing:
+        try:
+            return self._read_dir(path)
+        except OSError:
+            return [], []
+
+    # ── Parallel mode ────────────────────────────────────────────────────────
+
+    def _iter_parallel(self, root: str, lister: Callable[[str], Listing], descend: Descend):
+        listings = self._walk_parallel(root, lister, descend)
+        # Replay the listings depth-first, as the single-threaded walk would.
+        stack = [root]
+        while stack:
+            files, subdirs = listings.get(stack.pop(), ((), ()))
+            yield from files
+            stack.extend(reversed(subdirs))
+
+    def _walk_parallel(self, root: str, lister: Callable[[str], Listing],
+                       descend: Descend = None) -> Dict[str, Listing]:
+        """
+        List every directory under `root` with a work-stealing pool: each
+        worker takes the newest directory from its own deque (depth-first,
+        good locality) and, when that runs dry, steals the oldest one from
+        another worker's deque (the top of a large unexplored subtree).
+        """
+        listings: Dict[str, Listing] = {}
+        queues  = [deque() for _ in range(self._workers)]
+        queues[0].append(root)
+        cond    = Condition()
+        pending = [1]  # directories queued or being listed
+
+        def steal(me: int) -> Optional[str]:
+            for k in range(1, len(queues)):
+                try:
+                    return queues[(me + k) % len(queues)].popleft()
+                except IndexError:
+                    continue
+            return None
+
+        def work(me: int) -> None:
+            own = queues[me]
+            while True:
+                try:
+                    path = own.pop()
+                except IndexError:
+                    path = steal(me)
+                if path is None:
+                    with cond:
+                        if pending[0] == 0:
+                            return
+                        cond.wait(0.05)
+                    continue
+                subdirs: List[str] = []
+                try:
+                    listings[path] = files_subdirs = lister(path)
+                    subdirs = files_subdirs[1] if descend is None \
+                        else [d for d in files_subdirs[1] if descend(d)]
+                    own.extend(subdirs)
+                finally:
+                    with cond:
+                        pending[0] += len(subdirs) - 1
+                        if subdirs or pending[0] == 0:
+                            cond.notify_all()
+
+        threads = [Thread(target=work, args=(i,), daemon=True, name=f"wis-scan-{i}")
+                   for i in range(self._workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return listings
+
+    def _iter_walk(self, root: str, recursive: bool, lister: Callable[[str], Listing],
+                   descend: Descend):
+        stack = [root]
+        while stack:
+            files, subdirs = lister(stack.pop())
+            yield from files
+            if recursive:
+                stack.extend(reversed(subdirs if descend is None
+                                      else [d for d in subdirs if descend(d)]))
+
+    # ── Incremental mode ─────────────────────────────────────────────────────
+
+    def _list_dir(self, path: str, changed_only: bool) -> Listing:
+        """
+        Like _list_uncached, and remembers the directory's mtime/inode; with
+        `changed_only`, a directory that has not changed since is not read
+        again and contributes no files.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._forget_tree(path)
+            return [], []
+        cached = self._dirs.get(path)
+        if changed_only and cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_ino:
+            return [], cached[2]
+        try:
+            files, subdirs = self._read_dir(path)
+        except OSError:
+            self._forget_tree(path)
+            return [], []
+        if cached:
+            for gone in set(cached[2]).difference(subdirs):
+                self._forget_tree(gone)
+        mtime = st.st_mtime_ns
+        newest = max((key[3] for _, key in files), default=mtime)
+        if time.time_ns() - max(mtime, newest) < _MTIME_SLACK_NS:
+            mtime = -1
+        with self._lock:
+            self._dirs[path] = (mtime, st.st_ino, subdirs)
+        return files, subdirs
+
+    def _forget_tree(self, path: str) -> None:
+        prefix = os.path.join(path, "")
+        with self._lock:
+            self._dirs.pop(path, None)
+            for key in [k for k in self._dirs if k.startswith(prefix)]:
+                del self._dirs[key]
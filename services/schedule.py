@@ -0,0 +1,99 @@
+"""
+services/schedule.py
+--------------------
+ScanScheduler: decides which polled folders are due for a scan.
+"""
+
+import heapq
+import math
+import random
+import time
+from itertools import count
+from typing import Dict, List, Optional
+
+
+class _Slot:
+    __slots__ = ("fc", "interval", "backoff", "base", "due")
+
+    def __init__(self, fc: dict, interval: float, base: float):
+        self.fc       = fc
+        self.interval = interval
+        self.backoff  = 1
+        self.base     = base  # un-jittered slot the next scan belongs to
+        self.due      = base
+
+
+class ScanScheduler:
+    """
+    Fixed-rate scan schedule per folder. Each folder is scanned every
+    `scan_interval` seconds from its folder config (`default_interval`
+    otherwise), measured from slot to slot rather than from the end of the
+    previous scan, so scan cost does not stretch the period; slots missed
+    during a long scan are skipped, not replayed. Each scan is jittered by up
+    to `jitter` of the period so folders do not scan in lockstep. A scan that
+    finds nothing doubles the folder's period, up to `max_backoff` times the
+    interval but never past `max_idle` seconds (or the interval itself, if
+    that is longer); finding a file resets it.
+    """
+
+    def __init__(self, default_interval: float, jitter: float = 0.1, max_backoff: int = 2,
+                 max_idle: float = 30.0):
+        self._default     = max(0.05, float(default_interval))
+        self._jitter      = max(0.0, min(0.5, jitter))
+        self._max_backoff = max(1, int(max_backoff))
+        self._max_idle    = max(0.05, float(max_idle))
+        self._slots: Dict[int, _Slot] = {}
+        self._heap: list = []
+        self._seq = count()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def interval(self, fc: dict) -> float:
+        try:
+            value = float(fc.get("scan_interval") or 0)
+        except (TypeError, ValueError):
+            value = 0.0
+        return max(0.05, value) if value > 0 else self._default
+
+    def add(self, fc: dict, now: Optional[float] = None) -> None:
+        """Schedule `fc`; its first scan is due right away."""
+        if id(fc) in self._slots:
+            return
+        slot = self._slots[id(fc)] = _Slot(fc, self.interval(fc),
+                                           time.monotonic() if now is None else now)
+        self._push(slot)
+
+    def next_due(self) -> Optional[float]:
+        """Monotonic time of the next scan, or None when no folder is scheduled."""
+        return self._heap[0][0] if self._heap else None
+
+    def due(self, now: Optional[float] = None) -> List[dict]:
+        """Pop the folders whose scan is due; report each back with `done()`."""
+        now   = time.monotonic() if now is None else now
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, slot = heapq.heappop(self._heap)
+            ready.append(slot.fc)
+        return ready
+
+    def done(self, fc: dict, found: bool, now: Optional[float] = None) -> None:
+        """Schedule the next scan of `fc` after one that did (or did not) find new files."""
+        slot = self._slots.get(id(fc))
+        if slot is None:
+            return
+        now = time.monotonic() if now is None else now
+        slot.backoff = 1 if found else min(self._max_backoff, slot.backoff * 2)
+        period = self._period(slot)
+        slot.base += period
+        if slot.base <= now:
+            slot.base += math.ceil((now - slot.base) / period) * period
+        self._push(slot)
+
+    def _period(self, slot: _Slot) -> float:
+        return max(slot.interval, min(slot.interval * slot.backoff, self._max_idle))
+
+    def _push(self, slot: _Slot) -> None:
+        period   = self._period(slot)
+        slot.due = slot.base + random.uniform(0.0, self._jitter * period)
+        heapq.heappush(self._heap, (slot.due, next(self._seq), slot))
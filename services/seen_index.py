@@ -0,0 +1,123 @@
+"""
+services/seen_index.py
+----------------------
+SeenIndex: on-disk record of files already handled, kept across restarts.
+"""
+
+import sqlite3
+from threading import RLock
+from typing import Iterable, Iterator, Optional, Tuple
+
+from services.scanner import FileKey
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    root  TEXT PRIMARY KEY,
+    scope TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    folder TEXT NOT NULL,
+    inode  TEXT NOT NULL,
+    size   INTEGER NOT NULL,
+    mtime  INTEGER NOT NULL,
+    path   TEXT NOT NULL,
+    PRIMARY KEY (folder, inode, size, mtime)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+"""
+
+
+def _row(root: str, path: str, key: FileKey) -> tuple:
+    # st_dev/st_ino can exceed sqlite's signed 64-bit integers, so they are stored as text.
+    dev, ino, size, mtime = key
+    return root, f"{dev}:{ino}", size, mtime, path
+
+
+class SeenIndex:
+    """
+    sqlite-backed set of seen files, grouped by monitored folder and keyed by
+    FileKey (device, inode, size, mtime), so a renamed or moved file is still
+    known. The path each file was recorded under is kept as well: a file at
+    the same path with the same size and mtime but a new inode (a remount
+    that renumbered inodes) counts as known too.
+
+    A folder is "known" once it has been snapshotted with a given scope
+    (recursive flag + watched extensions); files of a known folder that are
+    not in the index are new, even if they appeared while WIS was closed.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = RLock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self._path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ── Folders ──────────────────────────────────────────────────────────────
+
+    def folder_scope(self, root: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT scope FROM folders WHERE root = ?", (root,)).fetchone()
+        return row[0] if row else None
+
+    def replace_folder(self, root: str, scope: str,
+                       files: Iterable[Tuple[str, FileKey]]) -> int:
+        """Forget everything recorded for `root` and mark `files` (path, key) as its seen files."""
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM files WHERE folder = ?", (root,))
+                cur = db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                                     (_row(root, p, key) for p, key in files))
+                db.execute("INSERT OR REPLACE INTO folders (root, scope) VALUES (?, ?)",
+                           (root, scope))
+            return cur.rowcount
+
+    # ── Files ────────────────────────────────────────────────────────────────
+
+    def iter_keys(self, root: str) -> Iterator[FileKey]:
+        with self._lock:
+            cur = self._conn().execute(
+                "SELECT inode, size, mtime FROM files WHERE folder = ?", (root,))
+            while True:
+                rows = cur.fetchmany(4096)
+                if not rows:
+                    return
+                for inode, size, mtime in rows:
+                    dev, ino = inode.split(":")
+                    yield int(dev), int(ino), size, mtime
+
+    def contains(self, key: FileKey, root: str) -> bool:
+        folder, inode, size, mtime, _ = _row(root, "", key)
+        with self._lock:
+            return self._conn().execute(
+                "SELECT 1 FROM files WHERE folder = ? AND inode = ? AND size = ? AND mtime = ?",
+                (folder, inode, size, mtime)).fetchone() is not None
+
+    def contains_path(self, path: str, key: FileKey) -> bool:
+        """Whether `path` was recorded with the same size and mtime (under any inode)."""
+        with self._lock:
+            return self._conn().execute(
+                "SELECT 1 FROM files WHERE path = ? AND size = ? AND mtime = ?",
+                (path, key[2], key[3])).fetchone() is not None
+
+    def add(self, path: str, key: FileKey, root: str) -> None:
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                           _row(root, path, key))
@@ -0,0 +1,121 @@
+"""
+services/seen_set.py
+--------------------
+SeenSet: compact, memory-bounded set of seen-file fingerprints.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+from typing import Dict, Hashable, Iterable
+
+# Every entry is one unsigned 64-bit word: the top 48 bits are a hash of the
+# key, the low 16 bits the scan pass in which the entry was last seen.
+_TICK_BITS = 16
+_TICK_MASK = (1 << _TICK_BITS) - 1
+_FP_MASK   = ~_TICK_MASK & 0xFFFFFFFFFFFFFFFF
+_ENTRY_BYTES = 8
+_MIN_MERGE   = 4096
+
+
+class SeenSet:
+    """
+    Set of keys stored as sorted 64-bit fingerprints (8 bytes per entry).
+
+    Lookups touch the entry with the current pass number, so `sweep()` can
+    drop entries for files that were not seen during a complete scan and the
+    memory budget evicts the least recently seen entries first. Evicted keys
+    are reported as unseen again; callers needing exact answers must keep an
+    authoritative store (see SeenIndex) behind it.
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        self._keys   = array("Q")
+        self._recent: Dict[int, int] = {}
+        self._tick   = 1
+        self._max_entries = max_bytes // _ENTRY_BYTES if max_bytes > 0 else 0
+        self.evicted = 0
+
+    @staticmethod
+    def _fingerprint(key: Hashable) -> int:
+        # str hashes are salted per process, which is fine: fingerprints never leave memory.
+        return hash(key) & _FP_MASK
+
+    def __len__(self) -> int:
+        return len(self._keys) + len(self._recent)
+
+    def __contains__(self, key: Hashable) -> bool:
+        fp = self._fingerprint(key)
+        if fp in self._recent:
+            self._recent[fp] = self._tick
+            return True
+        i = bisect_left(self._keys, fp)
+        if i < len(self._keys) and self._keys[i] & _FP_MASK == fp:
+            self._keys[i] = fp | self._tick
+            return True
+        return False
+
+    def add(self, key: Hashable) -> None:
+        if key not in self:
+            self._recent[self._fingerprint(key)] = self._tick
+            if len(self._recent) >= max(_MIN_MERGE, len(self._keys) // 8):
+                self._merge()
+
+    def update(self, keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            if key not in self:
+                self._recent[self._fingerprint(key)] = self._tick
+        self._merge()
+
+    # ── Passes & eviction ────────────────────────────────────────────────────
+
+    def next_pass(self) -> int:
+        """Start a new scan pass; returns its number for a later `sweep()`."""
+        if self._tick == _TICK_MASK:
+            self._merge()
+            self._keys = array("Q", (v & _FP_MASK | 1 for v in self._keys))
+            self._tick = 1
+        self._tick += 1
+        return self._tick
+
+    def sweep(self, since: int) -> int:
+        """Drop entries not seen since pass `since`; returns how many were removed."""
+        self._merge()
+        before = len(self._keys)
+        self._keys = array("Q", (v for v in self._keys if v & _TICK_MASK >= since))
+        return before - len(self._keys)
+
+    def _merge(self) -> None:
+        if self._recent:
+            fresh = (fp | tick for fp, tick in self._recent.items())
+            self._keys = array("Q", sorted(chain(self._keys, fresh)))
+            self._recent = {}
+        if self._max_entries and len(self._keys) > self._max_entries:
+            self._evict(len(self._keys) - self._max_entries * 9 // 10)
+
+    def _evict(self, count: int) -> None:
+        """
+        Remove the `count` least recently seen entries. A pass is split when
+        needed (a snapshot or bulk load shares one pass number), dropping its
+        entries in fingerprint order, which is as good as random.
+        """
+        ticks = Counter(v & _TICK_MASK for v in self._keys)
+        cutoff, below = _TICK_MASK + 1, 0
+        for tick in sorted(ticks):
+            if below + ticks[tick] >= count:
+                cutoff = tick
+                break
+            below += ticks[tick]
+        split = count - below  # entries to drop from the cutoff pass
+        kept  = array("Q")
+        for v in self._keys:
+            tick = v & _TICK_MASK
+            if tick < cutoff:
+                continue
+            if tick == cutoff and split > 0:
+                split -= 1
+                continue
+            kept.append(v)
+        self.evicted += len(self._keys) - len(kept)
+        self._keys = kept
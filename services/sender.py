@@ -4,34 +4,122 @@ services/sender.py
 HTTP and null implementations of ISender.
 """
 
-import json
-import mimetypes
-import os
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from core.events import ISender
+from models.send_result import SendResult
+from services.bandwidth import TokenBucket
+from services.payload import Payload
 
 
 class HttpSender(ISender):
+    """Posts files with one pooled keep-alive `requests.Session` per webhook host."""
+
+    def __init__(self, pool_size: int = 10, keep_alive: bool = True):
+        self._pool_size  = max(1, int(pool_size))
+        self._keep_alive = keep_alive
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = Lock()
+        self._bandwidth: Optional[TokenBucket] = None
+        self._url_bandwidth: Dict[str, TokenBucket] = {}
+
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+
+    @property
+    def keep_alive(self) -> bool:
+        return self._keep_alive
+
+    def throttles(self, url: str) -> List[TokenBucket]:
+        """Bandwidth buckets an upload to `url` has to pay into."""
+        return [b for b in (self._bandwidth, self._url_bandwidth.get(url)) if b is not None]
+
+    def _session(self, url: str) -> requests.Session:
+        parts = urlsplit(url)
+        host  = f"{parts.scheme}://{parts.netloc}".lower()
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+                session.mount("http://",  adapter)
+                session.mount("https://", adapter)
+                if not self._keep_alive:
+                    session.headers["Connection"] = "close"
+                self._sessions[host] = session
+        return session
+
+    def send_payload(self, payload: Payload, url: str, timeout: int,
+                     username: str = "", avatar_url: str = "",
+                     wait: bool = False) -> SendResult:
+        body = payload.reader(username, avatar_url, self.throttles(url))
+        r = self._session(url).post(url, data=body, timeout=timeout,
+                                    params={"wait": "true"} if wait else None,
+                                    headers={"Content-Type": payload.content_type})
+        ok = r.status_code in (200, 201, 204)
+        attachments = []
+        if ok and wait:
+            try:
+                attachments = [a["url"] for a in r.json().get("attachments", ())]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+        return SendResult(ok, r.status_code, r.headers, attachments)
+
+    def send_links(self, url: str, links: List[str], timeout: int,
+                   username: str = "", avatar_url: str = "") -> SendResult:
+        """Post one image embed per link (at most 10, like attachments)."""
+        message = {"embeds": [{"image": {"url": link}} for link in links[:10]]}
+        if username:   message["username"]   = username
+        if avatar_url: message["avatar_url"] = avatar_url
+        r = self._session(url).post(url, json=message, timeout=timeout)
+        return SendResult(r.status_code in (200, 201, 204), r.status_code, r.headers)
+
     def send(self, file_path: str, url: str, timeout: int,
-             username: str = "", avatar_url: str = "") -> bool:
-        fname = os.path.basename(file_path)
-        mime, _ = mimetypes.guess_type(file_path)
-        mime = mime or "application/octet-stream"
-        with open(file_path, "rb") as fh:
-            files = {"file": (fname, fh, mime)}
-            if username or avatar_url:
-                payload = {}
-                if username:   payload["username"]   = username
-                if avatar_url: payload["avatar_url"] = avatar_url
-                files["payload_json"] = (None, json.dumps(payload), "application/json")
-            r = requests.post(url, files=files, timeout=timeout)
-        return r.status_code in (200, 201, 204)
+             username: str = "", avatar_url: str = "") -> SendResult:
+        return self.send_batch([file_path], url, timeout, username=username, avatar_url=avatar_url)
+
+    def send_batch(self, file_paths: List[str], url: str, timeout: int,
+                   username: str = "", avatar_url: str = "") -> SendResult:
+        """Post all files as attachments of a single message (`files[0]`, `files[1]`, ...)."""
+        payload = Payload(file_paths)
+        try:
+            return self.send_payload(payload, url, timeout, username=username, avatar_url=avatar_url)
+        finally:
+            payload.close()
+
+    def limit_bandwidth(self, total: float = 0, per_url: Optional[Dict[str, float]] = None) -> None:
+        """Throttle upload bodies as they are written: one shared bucket plus one per URL."""
+        self._bandwidth     = TokenBucket(total) if total > 0 else None
+        self._url_bandwidth = {url: TokenBucket(rate)
+                               for url, rate in (per_url or {}).items() if rate > 0}
+
+    def warm(self, urls: Iterable[str], timeout: int) -> None:
+        """Open a pooled connection (TCP + TLS) to every webhook host ahead of the first send."""
+        hosts = {}
+        for url in urls:
+            parts = urlsplit(url)
+            hosts.setdefault(f"{parts.scheme}://{parts.netloc}".lower(), url)
+        for url in hosts.values():
+            try:
+                self._session(url).head(url, timeout=timeout)
+            except requests.RequestException:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
 
 
 class NullSender(ISender):
     """No-op sender used for testing."""
     def send(self, file_path: str, url: str, timeout: int,
-             username: str = "", avatar_url: str = "") -> bool:
-        return True
+             username: str = "", avatar_url: str = "") -> SendResult:
+        return SendResult(True, 204)
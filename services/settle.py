@@ -0,0 +1,66 @@
+"""
+services/settle.py
+------------------
+SettleQueue: holds newly detected files until they stop changing.
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class SettleQueue:
+    """
+    Pending files keyed by path. A file is released once its (size, mtime)
+    has not changed for `delay` seconds; all pending files are checked on
+    each `poll()`, so a burst settles in one window instead of one per file.
+    Files that disappear while pending are dropped. `add()` can override the
+    delay per file.
+    """
+
+    def __init__(self, delay: float):
+        self._delay = max(0.0, delay)
+        # path -> [size, mtime_ns, stable_since, payload, delay]
+        self._pending: Dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._pending
+
+    def add(self, path: str, payload: Any, delay: Optional[float] = None) -> bool:
+        """Start settling `path`; returns False if it is already pending or gone."""
+        if path in self._pending:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        self._pending[path] = [st.st_size, st.st_mtime_ns, time.monotonic(), payload,
+                               self._delay if delay is None else max(0.0, delay)]
+        return True
+
+    def next_due(self) -> Optional[float]:
+        """Monotonic time of the next useful `poll()`, or None when nothing is pending."""
+        # A change in between is caught by that check and simply restarts the window.
+        if not self._pending:
+            return None
+        return min(entry[2] + entry[4] for entry in self._pending.values())
+
+    def poll(self) -> List[Tuple[str, int, Any]]:
+        """Check every pending file; returns (path, size, payload) of those that settled."""
+        now   = time.monotonic()
+        ready = []
+        for path, entry in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (entry[0], entry[1]):
+                entry[0], entry[1], entry[2] = st.st_size, st.st_mtime_ns, now
+            elif now - entry[2] >= entry[4]:
+                del self._pending[path]
+                ready.append((path, st.st_size, entry[3]))
+        return ready
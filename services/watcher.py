@@ -0,0 +1,212 @@
+"""
+services/watcher.py
+-------------------
+InotifyWatcher: event-driven detection of new image files (Linux only).
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+from threading import Lock, Thread
+from typing import Callable, Dict, Optional, Tuple
+
+from services.pathfilter import PathFilter, relative
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_ISDIR       = 0x40000000
+
+_FILE_MASK = IN_CLOSE_WRITE | IN_MOVED_TO
+_DIR_MASK  = IN_CREATE | IN_MOVED_TO
+
+_EVENT_HDR = struct.Struct("iIII")
+
+_libc = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _libc.inotify_init1.argtypes     = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc.inotify_rm_watch.argtypes  = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        _libc = None
+
+
+class WatchError(OSError):
+    """Raised when a folder cannot be (fully) watched, e.g. the watch limit is hit."""
+
+
+class InotifyWatcher:
+    """
+    Watches folders with inotify and reports finished files through `on_file`.
+
+    `on_file(path, folder_config)` is called from the watcher thread for every
+    IN_CLOSE_WRITE / IN_MOVED_TO of a watched extension. `on_overflow()` is
+    called when the kernel queue overflowed and events were lost, and
+    `on_fallback(folder_config)` when a new subdirectory could not be watched
+    so the folder has to go back to polling. A folder's PathFilter keeps
+    excluded (and too deep) subdirectories unwatched and filters its files.
+    """
+
+    def __init__(self, formats: set,
+                 on_file:     Callable[[str, dict], None],
+                 on_overflow: Callable[[], None],
+                 on_fallback: Callable[[dict], None]):
+        if _libc is None:
+            raise WatchError(errno.ENOSYS, "inotify is not available on this platform")
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise WatchError(err, os.strerror(err))
+        self._fd          = fd
+        self._formats     = formats
+        self._on_file     = on_file
+        self._on_overflow = on_overflow
+        self._on_fallback = on_fallback
+        self._lock        = Lock()
+        self._wds: Dict[int, Tuple[str, dict]] = {}
+        # id(folder config) -> (root prefix, rules)
+        self._rules: Dict[int, Tuple[str, PathFilter]] = {}
+        self._running     = False
+        self._thread: Optional[Thread] = None
+
+    @staticmethod
+    def available() -> bool:
+        return _libc is not None
+
+    # ── Watch registration ───────────────────────────────────────────────────
+
+    def add_folder(self, fc: dict, rules: Optional[PathFilter] = None) -> None:
+        """Watch a folder (and every subdirectory if recursive). Raises WatchError."""
+        root = os.path.abspath(fc["path"])
+        if rules is not None:
+            self._rules[id(fc)] = (os.path.join(root, ""), rules)
+        self._add_watch(root, fc)
+        if fc.get("recursive", False):
+            for dirpath, dirnames, _ in os.walk(root):
+                dirnames[:] = [d for d in dirnames if self._descend(os.path.join(dirpath, d), fc)]
+                for d in dirnames:
+                    self._add_watch(os.path.join(dirpath, d), fc)
+
+    def remove_folder(self, fc: dict) -> None:
+        self._rules.pop(id(fc), None)
+        with self._lock:
+            wds = [wd for wd, (_, owner) in self._wds.items() if owner is fc]
+        for wd in wds:
+            _libc.inotify_rm_watch(self._fd, wd)
+            self._forget(wd)
+
+    def _add_watch(self, path: str, fc: dict) -> None:
+        mask = _FILE_MASK | IN_ONLYDIR
+        if fc.get("recursive", False):
+            mask |= _DIR_MASK
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise WatchError(err, "inotify watch limit reached "
+                                      "(raise fs.inotify.max_user_watches)", path)
+            raise WatchError(err, os.strerror(err), path)
+        with self._lock:
+            self._wds[wd] = (path, fc)
+
+    def _forget(self, wd: int) -> None:
+        with self._lock:
+            self._wds.pop(wd, None)
+
+    # ── Event loop ───────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        self._running = True
+        self._thread  = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+    def _run(self) -> None:
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        while self._running:
+            if not poller.poll(500):
+                continue
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError:
+                break
+            self._dispatch(buf)
+
+    def _dispatch(self, buf: bytes) -> None:
+        offset = 0
+        while offset + _EVENT_HDR.size <= len(buf):
+            wd, mask, _, length = _EVENT_HDR.unpack_from(buf, offset)
+            offset += _EVENT_HDR.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self._on_overflow()
+                continue
+            if mask & IN_IGNORED:
+                self._forget(wd)
+                continue
+            with self._lock:
+                entry = self._wds.get(wd)
+            if entry is None or not name:
+                continue
+            dir_path, fc = entry
+            path = os.path.join(dir_path, name)
+            if mask & IN_ISDIR:
+                # IN_MOVED_TO is in every mask, so a non-recursive folder sees
+                # directories moved in too; their contents are not its files.
+                if (fc.get("recursive", False) and mask & (IN_CREATE | IN_MOVED_TO)
+                        and self._descend(path, fc)):
+                    self._watch_new_dir(path, fc)
+            elif mask & _FILE_MASK and self._is_image(name) and self._wanted(path, fc):
+                self._on_file(path, fc)
+
+    def _watch_new_dir(self, path: str, fc: dict) -> None:
+        # Files may land in a new directory before its watch exists, so the
+        # subtree is listed once right after registering it.
+        try:
+            self._add_watch(path, fc)
+            for dirpath, dirnames, files in os.walk(path):
+                dirnames[:] = [d for d in dirnames if self._descend(os.path.join(dirpath, d), fc)]
+                for d in dirnames:
+                    self._add_watch(os.path.join(dirpath, d), fc)
+                for fn in files:
+                    fp = os.path.join(dirpath, fn)
+                    if self._is_image(fn) and self._wanted(fp, fc):
+                        self._on_file(fp, fc)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return
+            self.remove_folder(fc)
+            self._on_fallback(fc)
+
+    def _descend(self, path: str, fc: dict) -> bool:
+        entry = self._rules.get(id(fc))
+        return entry is None or entry[1].allow_dir(relative(entry[0], path))
+
+    def _wanted(self, path: str, fc: dict) -> bool:
+        entry = self._rules.get(id(fc))
+        return entry is None or entry[1].allow_file(relative(entry[0], path))
+
+    def _is_image(self, name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in self._formats
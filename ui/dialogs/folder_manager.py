@@ -1,19 +1,24 @@
 import os
+import re
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from typing import Callable
+from typing import Callable, Iterable, Optional
 
 from core.config import C
+from services.pathfilter import PathFilter, split_patterns
 from ui.components.factory import mk_btn, mk_entry, mk_label, mk_chk
 from ui.components.factory import BasePopup
 from ui.components.tree_panel import TreePanel
 
 class FolderManager(BasePopup):
-    def __init__(self, parent, folders: list, on_save: Callable):
+    def __init__(self, parent, folders: list, on_save: Callable,
+                 degraded: Optional[Iterable[str]] = None):
         super().__init__(parent, "Folder Manager",
-                         "All enabled folders are scanned simultaneously", size="640x540")
-        self.folders = [dict(f) for f in folders]
-        self.on_save = on_save
+                         "All enabled folders are scanned simultaneously", size="680x680")
+        self.folders  = [dict(f) for f in folders]
+        self.on_save  = on_save
+        self.degraded = set(degraded or ())  # paths of folders not responding
+        self._edit_idx = None
         self._build()
         self._refresh()
 
@@ -21,19 +26,20 @@ class FolderManager(BasePopup):
         b = self.body
         top = tk.Frame(b, bg=C["bg"])
         top.pack(fill="x", side="top")
-        self.panel = TreePanel(top, columns=("on", "rec", "path"),
-                               headings=("On", "Recursive", "Folder Path"),
-                               widths=(44, 80, 440), height=7)
+        self.panel = TreePanel(top, columns=("on", "rec", "scan", "settle", "rules", "path"),
+                               headings=("On", "Recursive", "Scan", "Settle", "Rules", "Folder Path"),
+                               widths=(44, 80, 60, 60, 50, 310), height=7)
         self.panel.pack(fill="x")
         act = tk.Frame(top, bg=C["bg"])
         act.pack(fill="x", pady=(4, 0))
-        mk_btn(act, "Toggle",           self._toggle,     color=C["bg3"], fg=C["warning"]).pack(side="left", padx=(0, 4))
+        mk_btn(act, "Edit",             self._edit,       color=C["bg3"], fg=C["fg"]).pack(side="left", padx=(0, 4))
+        mk_btn(act, "Toggle",           self._toggle,     color=C["bg3"], fg=C["warning"]).pack(side="left", padx=4)
         mk_btn(act, "Toggle Recursive", self._toggle_rec, color=C["bg3"], fg=C["accent"]).pack(side="left", padx=4)
         mk_btn(act, "Remove",           self._remove,     color=C["bg3"], fg=C["danger"]).pack(side="left", padx=4)
         tk.Frame(b, bg=C["border"], height=1).pack(fill="x", pady=8, side="top")
         bottom = tk.Frame(b, bg=C["bg"])
         bottom.pack(fill="x", side="top")
-        mk_label(bottom, "Add Folder", fg=C["accent"],
+        mk_label(bottom, "Add / Edit Folder", fg=C["accent"],
                  font=("Segoe UI", 9, "bold")).pack(anchor="w", pady=(0, 8))
         path_row = tk.Frame(bottom, bg=C["bg"])
         path_row.pack(fill="x", pady=(0, 6))
@@ -42,20 +48,67 @@ class FolderManager(BasePopup):
         mk_entry(path_row, textvariable=self._path_var, width=2).pack(side="left", fill="x", expand=True)
         self._recursive_var = tk.BooleanVar(value=True)
         mk_chk(bottom, "Recursive (include subfolders)", self._recursive_var, bg=C["bg"]).pack(anchor="w", pady=(0, 8))
+        timing_row = tk.Frame(bottom, bg=C["bg"])
+        timing_row.pack(fill="x", pady=(0, 8))
+        mk_label(timing_row, "Scan every:", fg=C["fg2"]).pack(side="left")
+        self._interval_var = tk.StringVar()
+        mk_entry(timing_row, textvariable=self._interval_var, width=6).pack(side="left", padx=(4, 10))
+        mk_label(timing_row, "Settle:", fg=C["fg2"]).pack(side="left")
+        self._settle_var = tk.StringVar()
+        mk_entry(timing_row, textvariable=self._settle_var, width=6).pack(side="left", padx=(4, 0))
+        mk_label(timing_row, "seconds  (empty = global setting)",
+                 fg=C["fg2"], font=("Segoe UI", 7)).pack(side="left", padx=(6, 0))
+        self._include_var = tk.StringVar()
+        self._exclude_var = tk.StringVar()
+        for label, var in (("Include:", self._include_var), ("Exclude:", self._exclude_var)):
+            row = tk.Frame(bottom, bg=C["bg"])
+            row.pack(fill="x", pady=(0, 4))
+            mk_label(row, label, fg=C["fg2"], width=8, anchor="w").pack(side="left")
+            mk_entry(row, textvariable=var, width=2).pack(side="left", fill="x", expand=True, padx=(4, 0))
+        depth_row = tk.Frame(bottom, bg=C["bg"])
+        depth_row.pack(fill="x", pady=(0, 8))
+        mk_label(depth_row, "Max depth:", fg=C["fg2"]).pack(side="left")
+        self._depth_var = tk.StringVar()
+        mk_entry(depth_row, textvariable=self._depth_var, width=6).pack(side="left", padx=(4, 0))
+        mk_label(depth_row, "Comma-separated globs (e.g. .thumbnails, cache, raw/*) or re:regex; "
+                            "depth empty = unlimited",
+                 fg=C["fg2"], font=("Segoe UI", 7)).pack(side="left", padx=(6, 0))
         add_frame = tk.Frame(bottom, bg=C["bg"])
         add_frame.pack(fill="x")
-        mk_btn(add_frame, "+ Add Folder", self._add, color=C["accent2"], fg=C["bg"]).pack(side="left")
+        self._add_btn = mk_btn(add_frame, "+ Add Folder", self._add, color=C["accent2"], fg=C["bg"])
+        self._add_btn.pack(side="left")
+        mk_btn(add_frame, "Clear", self._clear_form, color=C["bg3"], fg=C["fg2"]).pack(side="left", padx=8)
         self.add_footer_buttons(self._save)
 
     def _refresh(self):
         self.panel.clear()
         for i, f in enumerate(self.folders):
+            on = "✔" if f.get("enabled", True) else "—"
+            if on == "✔" and f.get("path") in self.degraded:
+                on = "⚠"
             self.panel.insert(i, (
-                "✔" if f.get("enabled",   True)  else "—",
+                on,
                 "✔" if f.get("recursive", False) else "—",
+                f"{f['scan_interval']:g}s" if f.get("scan_interval") else "—",
+                f"{f['settle_delay']:g}s" if f.get("settle_delay") is not None else "—",
+                "✔" if PathFilter.for_folder(f) is not None else "—",
                 f.get("path", ""),
             ))
 
+    def _edit(self):
+        idx = self.panel.selected_idx()
+        if idx is None: return
+        f = self.folders[idx]
+        self._path_var.set(f.get("path", ""))
+        self._recursive_var.set(f.get("recursive", False))
+        self._interval_var.set(f"{f['scan_interval']:g}" if f.get("scan_interval") else "")
+        self._settle_var.set(f"{f['settle_delay']:g}" if f.get("settle_delay") is not None else "")
+        self._include_var.set(", ".join(split_patterns(f.get("include"))))
+        self._exclude_var.set(", ".join(split_patterns(f.get("exclude"))))
+        self._depth_var.set(str(f["max_depth"]) if f.get("max_depth") else "")
+        self._edit_idx = idx
+        self._add_btn.config(text="Update")
+
     def _toggle(self):
         idx = self.panel.selected_idx()
         if idx is None: return
@@ -87,12 +140,59 @@ class FolderManager(BasePopup):
             messagebox.showwarning("Missing", "Select or type a folder path.", parent=self); return
         if not os.path.isdir(path):
             messagebox.showwarning("Invalid", f"Not a valid directory:\n{path}", parent=self); return
-        if path in {f["path"] for f in self.folders}:
+        if path in {f["path"] for i, f in enumerate(self.folders) if i != self._edit_idx}:
             messagebox.showinfo("Duplicate", "This folder is already in the list.", parent=self); return
-        self.folders.append({"path": path, "enabled": True, "recursive": self._recursive_var.get()})
-        self._path_var.set("")
+        try:
+            interval = float(self._interval_var.get().strip() or 0)
+            settle   = self._settle_var.get().strip()
+            settle   = float(settle) if settle else None
+        except ValueError:
+            messagebox.showwarning("Invalid", "Scan and settle times must be numbers (seconds).",
+                                   parent=self); return
+        if interval < 0 or (settle is not None and settle < 0):
+            messagebox.showwarning("Invalid", "Scan and settle times cannot be negative.",
+                                   parent=self); return
+        include = split_patterns(self._include_var.get())
+        exclude = split_patterns(self._exclude_var.get())
+        try:
+            depth = int(self._depth_var.get().strip() or 0)
+            PathFilter(include, exclude, depth)
+        except ValueError:
+            messagebox.showwarning("Invalid", "Max depth must be a whole number.", parent=self); return
+        except re.error as e:
+            messagebox.showwarning("Invalid", f"Bad pattern: {e}", parent=self); return
+        entry = dict(self.folders[self._edit_idx]) if self._edit_idx is not None \
+            else {"enabled": True}
+        entry.update(path=path, recursive=self._recursive_var.get())
+        for key in ("scan_interval", "settle_delay", "include", "exclude", "max_depth"):
+            entry.pop(key, None)
+        if interval > 0:
+            entry["scan_interval"] = interval
+        if settle is not None:
+            entry["settle_delay"] = settle
+        if include:
+            entry["include"] = include
+        if exclude:
+            entry["exclude"] = exclude
+        if depth > 0:
+            entry["max_depth"] = depth
+        if self._edit_idx is not None:
+            self.folders[self._edit_idx] = entry
+        else:
+            self.folders.append(entry)
+        self._clear_form()
         self._refresh()
 
+    def _clear_form(self):
+        self._path_var.set("")
+        self._interval_var.set("")
+        self._settle_var.set("")
+        self._include_var.set("")
+        self._exclude_var.set("")
+        self._depth_var.set("")
+        self._edit_idx = None
+        self._add_btn.config(text="+ Add Folder")
+
     def _save(self):
         try:    self.on_save(self.folders)
         finally: self.destroy()
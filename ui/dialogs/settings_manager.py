@@ -20,8 +20,37 @@ from ui.styles.theme_manager import mk_btn, mk_entry, mk_label, mk_chk
 
 _BEHAVIOUR_ROWS: List[Tuple[str, str, float]] = [
     ("Scan rate (seconds)",         "scan_rate",    1.0),
+    ("Idle scan backoff (max ×, 1 = off)", "scan_idle_backoff", 2),
     ("Send timeout (seconds)",      "send_timeout", 30),
     ("File settle delay (seconds)", "file_delay",   0.8),
+    ("Seen-file cache budget (MB)", "seen_cache_mb", 64),
+    ("Scan threads per recursive folder", "scan_workers", 4),
+    ("Folder listing deadline (seconds)", "scan_deadline", 30.0),
+    ("Full re-list interval (seconds)", "sweep_interval", 600.0),
+    ("Sender threads",              "send_workers",  4),
+    ("Send queue size (files)",     "send_queue_size", 100),
+    ("Upload limit (KB/s, 0 = off)", "bandwidth_kbps", 0),
+    ("Retry attempts (0 = off)",    "retry_attempts", 8),
+    ("Retry base delay (seconds)",  "retry_base_delay", 5.0),
+    ("Circuit breaker failures (0 = off)", "breaker_threshold", 5),
+    ("Circuit probe interval (seconds)",   "breaker_probe_interval", 60.0),
+    ("Batch window (seconds)",      "batch_window", 0.5),
+    ("Max files per batch",         "batch_max_files", 10),
+    ("Max batch size (MB)",         "batch_max_mb", 8),
+    ("Connections per host (restart)", "http_pool_size", 10),
+]
+
+_BEHAVIOUR_TOGGLES: List[Tuple[str, str, bool]] = [
+    ("Use file system events when available  (inotify, Linux)", "use_inotify", True),
+    ("Incremental scan  (only re-list changed directories)",    "incremental_scan", True),
+    ("Keep webhook connections alive  (restart)",                "http_keep_alive", True),
+    ("Pre-connect to webhooks when monitoring starts",           "http_prewarm", True),
+    ("Adapt uploads per webhook to latency and 429s",            "adaptive_concurrency", True),
+    ("Batch files into multi-attachment posts",                  "batch_uploads", False),
+    ("Upload once, post the link to the other webhooks",         "link_fanout", False),
+    ("Run monitoring on asyncio  (restart)",                     "async_engine", False),
+    ("Skip images whose content was already sent  (content hash)", "dedup_uploads", False),
+    ("Post skipped duplicates as a link to the earlier upload",  "dedup_links", False),
 ]
 
 _STATS_ROWS: List[Tuple[str, str, int]] = [
@@ -92,6 +121,11 @@ class SettingsManager(BasePopup):
         self._section(inner, "Behaviour")
         for label, key, default in _BEHAVIOUR_ROWS:
             self._num_row(inner, label, key, default, self._store.values)
+        for label, key, default in _BEHAVIOUR_TOGGLES:
+            row = tk.Frame(inner, bg=C["bg"])
+            row.pack(fill="x", pady=2)
+            self._vars[key] = tk.BooleanVar(value=bool(self._store.values.get(key, default)))
+            mk_chk(row, label, self._vars[key], bg=C["bg"]).pack(side="left")
         tk.Frame(inner, bg=C["bg"], height=6).pack()
 
         # ── File types ──
@@ -424,11 +458,13 @@ class SettingsManager(BasePopup):
     # ── Save ──────────────────────────────────────────────────────────────────
 
     def _save(self):
-        for key in ("scan_rate", "send_timeout", "file_delay"):
+        for _, key, _default in _BEHAVIOUR_ROWS:
             try:
                 self._store.values[key] = float(self._vars[key].get())
             except ValueError:
                 self._store.values[key] = DEFAULTS[key]
+        for _, key, _default in _BEHAVIOUR_TOGGLES:
+            self._store.values[key] = bool(self._vars[key].get())
         self._store.values["formats"]       = self._vars["formats"].get().strip()
         self._store.values["sound_enabled"] = bool(self._vars["sound_enabled"].get())
         try:
@@ -7,6 +7,7 @@ StatsWindow: the statistics analytics dashboard.
 import os
 import tkinter as tk
 from tkinter import messagebox, ttk
+from typing import Callable, Dict, Optional
 
 from core.config import C, StatisticsStore
 from ui.components.charts import BarChart, PieChart
@@ -16,10 +17,12 @@ from ui.styles.theme_manager import mk_btn, mk_label
 
 
 class StatsWindow(BasePopup):
-    def __init__(self, parent, stats: StatisticsStore):
+    def __init__(self, parent, stats: StatisticsStore,
+                 circuits: Optional[Callable[[], Dict[str, str]]] = None):
         super().__init__(parent, "Statistics", "Send history & analytics", size="860x640")
         self.resizable(True, True)
-        self._stats = stats
+        self._stats    = stats
+        self._circuits = circuits or dict
         self._build()
 
     def _build(self):
@@ -64,17 +67,22 @@ class StatsWindow(BasePopup):
         sends  = self._stats.sends
         total  = len(sends)
         ok     = sum(1 for s in sends if s.get("ok"))
-        fail   = total - ok
-        rate   = f"{100 * ok / total:.1f}%" if total else "—"
+        defer  = sum(1 for s in sends if s.get("deferred"))
+        dedup  = sum(1 for s in sends if s.get("deduplicated"))
+        skip   = sum(1 for s in sends if s.get("deduplicated") and not s.get("ok"))
+        fail   = total - ok - defer - skip
+        rate   = f"{100 * ok / (ok + fail):.1f}%" if ok + fail else "—"
         for val, lbl, col in [
             (str(total), "Total Sent",   C["accent"]),
             (str(ok),    "Successful",   C["accent2"]),
             (str(fail),  "Failed",       C["danger"]),
+            (str(defer), "Deferred",     C["fg2"]),
+            (str(dedup), "Deduplicated", C["fg2"]),
             (rate,       "Success Rate", C["warning"]),
             (str(len(self._stats.errors)), "Errors", C["fg2"]),
         ]:
             f = tk.Frame(summary, bg=C["bg2"])
-            f.pack(side="left", padx=18)
+            f.pack(side="left", padx=14)
             tk.Label(f, text=val, bg=C["bg2"], fg=col,  font=("Segoe UI", 18, "bold")).pack()
             tk.Label(f, text=lbl, bg=C["bg2"], fg=C["fg2"], font=("Segoe UI", 8)).pack()
 
@@ -105,11 +113,16 @@ class StatsWindow(BasePopup):
         mk_label(p, "Webhook Breakdown", fg=C["fg2"],
                  font=("Segoe UI", 8, "bold")).pack(anchor="w", padx=10, pady=(6, 2))
         self._webhook_tree = TreePanel(p,
-            columns=("name", "sent", "failed", "rate"),
-            headings=("Webhook", "Sent", "Failed", "Success Rate"),
-            widths=(220, 80, 80, 120), height=8)
+            columns=("name", "sent", "failed", "deferred", "dedup", "rate", "circuit"),
+            headings=("Webhook", "Sent", "Failed", "Deferred", "Duplicates", "Success Rate",
+                      "Circuit"),
+            widths=(170, 60, 60, 70, 75, 95, 80), height=8)
         self._webhook_tree.pack(fill="both", expand=True, padx=8, pady=4)
-        self._repopulate(self._webhook_tree, self._stats.webhook_table())
+        self._repopulate(self._webhook_tree, self._webhook_rows())
+
+    def _webhook_rows(self):
+        circuits = self._circuits()
+        return [row + (circuits.get(row[0], "—"),) for row in self._stats.webhook_table()]
 
     def _build_folders(self):
         p = self._tabs["Folders"]
@@ -185,7 +198,7 @@ class StatsWindow(BasePopup):
         self._monthly_chart.update_data(self._stats.months_data(n))
         self._ext_pie.update_data(self._stats.ext_data())
         self._webhook_bar.update_data(self._stats.webhook_data())
-        self._repopulate(self._webhook_tree, self._stats.webhook_table())
+        self._repopulate(self._webhook_tree, self._webhook_rows())
         self._folder_bar.update_data(
             [(os.path.basename(l) or l, v) for l, v in self._stats.folder_data()])
         self._repopulate(self._folder_tree, self._stats.folder_data())
@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import messagebox
-from typing import Callable, List
+from typing import Callable, Dict, List, Optional
 
 from core.config import C
 from ui.components.factory import mk_btn, mk_entry, mk_label, mk_chk
@@ -10,12 +10,14 @@ from ui.dialogs.profile_manager import SharedProfileManager
 
 
 class WebhookManager(BasePopup):
-    def __init__(self, parent, webhooks: list, profiles: list, on_save: Callable):
+    def __init__(self, parent, webhooks: list, profiles: list, on_save: Callable,
+                 circuits: Optional[Dict[str, str]] = None):
         super().__init__(parent, "Webhook Manager",
-                         "One detection is sent to all enabled webhooks", size="620x600")
+                         "One detection is sent to all enabled webhooks", size="680x600")
         self.webhooks  = [dict(w) for w in webhooks]
         self.profiles  = profiles
         self.on_save   = on_save
+        self.circuits  = circuits or {}
         self._edit_idx = None
         self._build()
         self._refresh()
@@ -27,9 +29,9 @@ class WebhookManager(BasePopup):
         b = self.body
         top = tk.Frame(b, bg=C["bg"])
         top.pack(fill="x", side="top")
-        self.panel = TreePanel(top, columns=("on", "name", "profile", "url"),
-                               headings=("On", "Name", "Shared Profile", "URL"),
-                               widths=(44, 120, 120, 260), height=7)
+        self.panel = TreePanel(top, columns=("on", "name", "profile", "circuit", "url"),
+                               headings=("On", "Name", "Shared Profile", "Circuit", "URL"),
+                               widths=(44, 120, 120, 70, 250), height=7)
         self.panel.pack(fill="x")
         act = tk.Frame(top, bg=C["bg"])
         act.pack(fill="x", pady=(4, 0))
@@ -52,6 +54,13 @@ class WebhookManager(BasePopup):
         self._url_var = tk.StringVar()
         mk_entry(url_row, textvariable=self._url_var, width=56).pack(
             side="left", padx=(4, 0), fill="x", expand=True)
+        bw_row = tk.Frame(bottom, bg=C["bg"])
+        bw_row.pack(fill="x", pady=2)
+        mk_label(bw_row, "Limit:", fg=C["fg2"], width=6, anchor="w").pack(side="left")
+        self._bw_var = tk.StringVar()
+        mk_entry(bw_row, textvariable=self._bw_var, width=8).pack(side="left", padx=(4, 0))
+        mk_label(bw_row, "KB/s upload cap for this webhook  (empty = no limit)",
+                 fg=C["fg2"], font=("Segoe UI", 7)).pack(side="left", padx=(6, 0))
         tk.Frame(bottom, bg=C["border"], height=1).pack(fill="x", pady=(8, 4))
         mk_label(bottom, "Shared Profile  (optional)", fg=C["accent2"],
                  font=("Segoe UI", 8, "bold")).pack(anchor="w")
@@ -114,7 +123,8 @@ class WebhookManager(BasePopup):
             if w.get("shared_profile_enabled") and w.get("shared_profile"):
                 profile_label = f"✔ {w['shared_profile']}"
             self.panel.insert(i, ("✔" if w.get("enabled", True) else "—",
-                                  w.get("name", ""), profile_label, w.get("url", "")))
+                                  w.get("name", ""), profile_label,
+                                  self.circuits.get(w.get("url", ""), "—"), w.get("url", "")))
 
     def _edit(self):
         idx = self.panel.selected_idx()
@@ -122,6 +132,7 @@ class WebhookManager(BasePopup):
         w = self.webhooks[idx]
         self._name_var.set(w.get("name", ""))
         self._url_var.set(w.get("url", ""))
+        self._bw_var.set(str(w.get("bandwidth_kbps") or ""))
         self._sp_enabled_var.set(bool(w.get("shared_profile_enabled")))
         sp = w.get("shared_profile", "")
         names = self._profile_names()
@@ -154,6 +165,10 @@ class WebhookManager(BasePopup):
             messagebox.showwarning("Missing", "Enter a name.", parent=self); return
         if not url.startswith("http"):
             messagebox.showwarning("Invalid URL", "URL must start with http.", parent=self); return
+        try:
+            bandwidth = float(self._bw_var.get().strip() or 0)
+        except ValueError:
+            messagebox.showwarning("Invalid Limit", "Limit must be a number (KB/s).", parent=self); return
         sp_enabled = self._sp_enabled_var.get()
         sp_name    = self._sp_var.get() if sp_enabled else ""
         if sp_enabled and not self._profile_names():
@@ -162,6 +177,8 @@ class WebhookManager(BasePopup):
                 parent=self); return
         entry = {"name": name, "url": url, "enabled": True,
                  "shared_profile_enabled": sp_enabled, "shared_profile": sp_name}
+        if bandwidth > 0:
+            entry["bandwidth_kbps"] = bandwidth
         if self._edit_idx is not None:
             entry["enabled"] = self.webhooks[self._edit_idx].get("enabled", True)
             self.webhooks[self._edit_idx] = entry
@@ -174,6 +191,7 @@ class WebhookManager(BasePopup):
     def _clear_form(self):
         self._name_var.set("")
         self._url_var.set("")
+        self._bw_var.set("")
         self._sp_enabled_var.set(False)
         self._on_sp_toggle()
         self._edit_idx = None
@@ -8,11 +8,15 @@ import os
 import time
 import tkinter as tk
 from threading import Thread
-from typing import Callable
+from typing import Callable, Optional
 
 from core.config import C, DEFAULTS, _LOG_ICONS, SettingsStore, StatisticsStore
 from core.events import ISender, IAudioPlayer
+from services.async_monitor import AsyncMonitoringService
+from services.content_index import ContentIndex
 from services.monitor import MonitoringService
+from services.outbox import Outbox
+from services.seen_index import SeenIndex
 from ui.dialogs.folder_manager import FolderManager
 from ui.dialogs.settings_manager import SettingsManager
 from ui.dialogs.stats_dashboard import StatsWindow
@@ -27,7 +31,10 @@ class WIS:
                  sender: ISender,
                  audio:  IAudioPlayer,
                  store:  SettingsStore,
-                 stats:  StatisticsStore):
+                 stats:  StatisticsStore,
+                 seen:   Optional[SeenIndex] = None,
+                 outbox: Optional[Outbox] = None,
+                 content: Optional[ContentIndex] = None):
         self.root   = root
         self._store = store
         self._stats = stats
@@ -39,11 +46,18 @@ class WIS:
         self._auto_start_var = tk.BooleanVar(value=store.auto_start)
         self._debug_var      = tk.BooleanVar(value=store.debug_mode)
 
-        self._monitoring = MonitoringService(
+        engine = AsyncMonitoringService if store.values.get("async_engine") else MonitoringService
+        self._monitoring = engine(
             sender=sender, audio=audio, stats=stats,
             on_log=self._log_from_thread,
             on_counters=self._update_counters,
+            seen_index=seen,
+            outbox=outbox,
+            on_folders=self._folders_from_thread,
+            content=content,
+            on_stopped=self._stopped_from_thread,
         )
+        self._outbox = outbox
 
         C.update({k: store.values[k] for k in DEFAULTS if k in store.values})
         self.root.configure(bg=C["bg"])
@@ -115,6 +129,10 @@ class WIS:
         stats_bar.pack(fill="x", pady=(0, 6))
         self._s_sent  = self._pill(stats_bar, "0", "Sent")
         self._s_fail  = self._pill(stats_bar, "0", "Failed")
+        self._s_queue = self._pill(stats_bar, "0", "Queued")
+        self._s_retry = self._pill(stats_bar, "0", "Outbox")
+        if self._outbox is not None:
+            self._s_retry.config(text=str(len(self._outbox)))
         self._s_hooks = self._pill(stats_bar, "0", "Webhooks")
         self._s_dirs  = self._pill(stats_bar, "0", "Folders")
         self._refresh_pill_stats()
@@ -173,8 +191,10 @@ class WIS:
     def _refresh_pill_stats(self):
         self._s_hooks.config(
             text=str(sum(1 for w in self._store.webhooks if w.get("enabled", True))))
-        self._s_dirs.config(
-            text=str(sum(1 for f in self._store.folders  if f.get("enabled", True))))
+        enabled  = sum(1 for f in self._store.folders if f.get("enabled", True))
+        degraded = len(self._monitoring.degraded_folders())
+        self._s_dirs.config(text=f"{enabled} ⚠{degraded}" if degraded else str(enabled),
+                            fg=C["warning"] if degraded else C["accent"])
 
     # ── Dialog openers ────────────────────────────────────────────────────────
 
@@ -185,7 +205,8 @@ class WIS:
             self._folder_lbl.config(text=self._folder_summary())
             self._refresh_pill_stats()
             self.log("Folder list updated", "info")
-        FolderManager(self.root, self._store.folders, on_save)
+        FolderManager(self.root, self._store.folders, on_save,
+                      degraded=self._monitoring.degraded_folders())
 
     def _open_webhooks(self):
         def on_save(v):
@@ -194,7 +215,8 @@ class WIS:
             self._webhook_lbl.config(text=self._webhook_summary())
             self._refresh_pill_stats()
             self.log("Webhook list updated", "info")
-        WebhookManager(self.root, self._store.webhooks, self._store.shared_profiles, on_save)
+        WebhookManager(self.root, self._store.webhooks, self._store.shared_profiles, on_save,
+                       circuits=self._monitoring.breaker_states())
 
     def _open_settings(self):
         def on_save(updated_store: SettingsStore):
@@ -205,7 +227,11 @@ class WIS:
         SettingsManager(self.root, self._store, on_save)
 
     def _open_stats(self):
-        StatsWindow(self.root, self._stats)
+        def circuits():
+            states = self._monitoring.breaker_states()
+            return {w.get("name", "?"): states[w["url"]]
+                    for w in self._store.webhooks if w.get("url") in states}
+        StatsWindow(self.root, self._stats, circuits)
 
     # ── Logging ───────────────────────────────────────────────────────────────
 
@@ -221,12 +247,21 @@ class WIS:
     def _log_from_thread(self, message: str, kind: str):
         self.root.after(0, self.log, message, kind)
 
-    def _update_counters(self, sent: int, fail: int):
+    def _update_counters(self, sent: int, fail: int, queued: int = 0, outbox: int = 0):
         self.root.after(0, lambda: (
             self._s_sent.config(text=str(sent)),
             self._s_fail.config(text=str(fail)),
+            self._s_queue.config(text=str(queued)),
+            self._s_retry.config(text=str(outbox)),
         ))
 
+    def _folders_from_thread(self, degraded: list):
+        self.root.after(0, self._refresh_pill_stats)
+
+    def _stopped_from_thread(self):
+        # The run ended on its own (its loop failed); unless it was restarted meanwhile.
+        self.root.after(0, lambda: None if self._monitoring.running else self.stop_monitoring())
+
     def clear_log(self):
         self._log_box.config(state="normal")
         self._log_box.delete("1.0", "end")
@@ -268,6 +303,7 @@ class WIS:
 
         self._s_sent.config(text="0")
         self._s_fail.config(text="0")
+        self._s_queue.config(text="0")
         self._start_btn.config(state="disabled")
         self._stop_btn.config(state="normal")
         self._status_pill.config(text="  MONITORING  ", bg="#1a3320", fg=C["accent2"])
@@ -276,6 +312,11 @@ class WIS:
         names = ", ".join(w["name"] for w in resolved_webhooks)
         self.log(f"Started — {len(valid)} folder(s) → {len(resolved_webhooks)} webhook(s): {names}", "ok")
 
+    def shutdown(self):
+        """Stop monitoring as the application exits."""
+        if self._monitoring.running:
+            self._monitoring.stop()
+
     def stop_monitoring(self):
         self._monitoring.stop()
         self._start_btn.config(state="normal")